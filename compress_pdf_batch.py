@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Nächtlicher Batch-Lauf über viele Pdf-Ordner ohne Oberfläche.
+
+Jeder Ordner (mit PDFs und optional `Inhaltsverzeichnis.md`) ist ein Job mit
+eigener Größengrenze und eigenem Ausgabepfad. Alle Jobs teilen sich den
+Worker-Pool aus compress_pdf_group: mehrere Jobs laufen gleichzeitig
+(große zuerst), und compress_documents verteilt die Seiten jedes Jobs
+auf alle Worker. Der Stand wird nach jedem Job in eine JSON-Datei
+geschrieben; ein erneuter Start überspringt fertige, unveränderte Ordner.
+
+    python3 compress_pdf_batch.py Faelle/* --output-dir Senden --max-size 1.9
+    python3 compress_pdf_batch.py --jobs jobs.json --state batch_state.json
+
+`jobs.json` enthält eine Liste wie
+`[{"input": "Faelle/0815", "output": "Senden/0815.pdf", "max_size_mb": 2.5}]`.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing import set_start_method
+
+import compress_pdf_group as pipeline
+
+# === PARAMETER ===
+PARALLEL_JOBS = 3                 # gleichzeitig laufende Ordner; die Seiten teilt der gemeinsame Pool auf
+STATE_FILE = "compress_batch_state.json"
+BATCH_TMP_DIR = pipeline.SCRIPT_DIR / "tmp_batch"
+
+# === AUSGABE JE JOB ===
+_job_name = threading.local()
+
+class _JobPrefixWriter:
+    """Stellt jeder Zeile den Namen des Jobs voran, der sie im aktuellen Thread ausgibt."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        name = getattr(_job_name, "value", None)
+        if name:
+            # print() schreibt Argumente einzeln: nur am Zeilenanfang präfixen
+            at_line_start = getattr(_job_name, "line_start", True)
+            parts = []
+            for line in text.splitlines(True):
+                parts.append(f"[{name}] {line}" if at_line_start and line.strip() else line)
+                at_line_start = line.endswith("\n")
+            _job_name.line_start = at_line_start
+            text = "".join(parts)
+        with self.lock:
+            self.stream.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+# === JOBS ===
+def load_jobs(args):
+    """Jobs aus `--jobs` und den Ordner-Argumenten; Ausgabe und Grenze mit Vorgabewerten ergänzt."""
+    specs = []
+    if args.jobs:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            specs.extend(json.load(f))
+    specs.extend({"input": folder} for folder in args.folders)
+
+    jobs = []
+    for spec in specs:
+        source = Path(spec["input"]).resolve()
+        output = Path(spec.get("output") or Path(args.output_dir) / f"{source.name}.pdf").resolve()
+        jobs.append({
+            "id": str(source),
+            "input": source,
+            "output": output,
+            "max_size_bytes": float(spec.get("max_size_mb", args.max_size)) * 1024 * 1024,
+        })
+    return jobs
+
+def job_fingerprint(job):
+    """Ändert sich, sobald eine Eingabedatei, das Inhaltsverzeichnis oder die Grenze sich ändert."""
+    digest = hashlib.sha256(f"{job['max_size_bytes']}|{job['output']}".encode())
+    for path in sorted(job["input"].iterdir()):
+        if path.suffix == ".pdf" or path.name == "Inhaltsverzeichnis.md":
+            stat = path.stat()
+            digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+def job_bytes(job):
+    return sum(path.stat().st_size for path in job["input"].glob("*.pdf"))
+
+# === FORTSCHRITT ===
+class BatchState:
+    """Fortschritt als JSON (Job-ID → Status); wird nach jedem Job atomar geschrieben."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f).get("jobs", {})
+
+    def is_done(self, job, fingerprint):
+        entry = self.jobs.get(job["id"])
+        return (entry is not None and entry["status"] == "done" and entry["fingerprint"] == fingerprint
+                and all(Path(output).exists() for output in entry["outputs"]))
+
+    def record(self, job, **entry):
+        with self.lock:
+            entry["finished"] = datetime.now().isoformat(timespec="seconds")
+            self.jobs[job["id"]] = entry
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"jobs": self.jobs}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+# === LAUF ===
+def run_job(job, state, fingerprint, index):
+    _job_name.value = job["input"].name
+    start = time.perf_counter()
+    try:
+        outputs = pipeline.run_compression(
+            job["max_size_bytes"],
+            source_dir=job["input"],
+            output_path=job["output"],
+            tmp_dir=BATCH_TMP_DIR / f"job_{index}",
+        )
+        status = "done" if outputs else "failed"
+        state.record(job, status=status, fingerprint=fingerprint, outputs=outputs,
+                     seconds=round(time.perf_counter() - start, 1))
+        return status
+    except pipeline.CompressionCancelled:
+        raise
+    except Exception as e:
+        print(f"❌ Fehler: {e}")
+        state.record(job, status="failed", fingerprint=fingerprint, outputs=[], error=str(e),
+                     seconds=round(time.perf_counter() - start, 1))
+        return "failed"
+    finally:
+        _job_name.value = None
+
+def run_batch(jobs, state_file=STATE_FILE, parallel=PARALLEL_JOBS, retry_failed=False):
+    """Bearbeitet alle Jobs auf dem gemeinsamen Pool; Rückgabe: Anzahl je Status."""
+    state = BatchState(state_file)
+    pending = []
+    summary = {"done": 0, "failed": 0, "skipped": 0}
+    for job in jobs:
+        if not job["input"].is_dir():
+            print(f"⚠️ Kein Ordner: {job['input']}")
+            summary["failed"] += 1
+            continue
+        fingerprint = job_fingerprint(job)
+        entry = state.jobs.get(job["id"])
+        if state.is_done(job, fingerprint) or (not retry_failed and entry and entry["status"] == "failed"
+                                              and entry["fingerprint"] == fingerprint):
+            summary["skipped"] += 1
+            continue
+        pending.append((job, fingerprint))
+
+    # Größte Ordner zuerst (LPT), damit am Ende nur kleine Jobs nachlaufen
+    pending.sort(key=lambda item: job_bytes(item[0]), reverse=True)
+    print(f"🗃️ {len(pending)} Jobs offen, {summary['skipped']} übersprungen, {parallel} parallel")
+    if not pending:
+        return summary
+
+    pipeline.get_pool()
+    pipeline.print_pool_metrics()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="batch-job") as executor:
+        futures = [executor.submit(run_job, job, state, fingerprint, index)
+                   for index, (job, fingerprint) in enumerate(pending)]
+        try:
+            for finished, future in enumerate(as_completed(futures), 1):
+                summary[future.result()] += 1
+                print(f"📊 {finished}/{len(pending)} Jobs fertig ({time.perf_counter() - start:.0f} s)")
+        except KeyboardInterrupt:
+            print("🛑 Abbruch – fertige Jobs sind gespeichert, der nächste Start macht dort weiter.")
+            for future in futures:
+                future.cancel()
+            pipeline.cancel_compression()
+            raise
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF-Ordner im Batch komprimieren")
+    parser.add_argument("folders", nargs="*", help="Eingabeordner (je Ordner ein Bündel)")
+    parser.add_argument("--jobs", help="JSON-Liste mit input, output, max_size_mb je Job")
+    parser.add_argument("--output-dir", default="Senden", help="Ziel für Ordner ohne eigenen Ausgabepfad")
+    parser.add_argument("--max-size", type=float, default=pipeline.MAX_SIZE_MB, help="Größengrenze in MB")
+    parser.add_argument("--state", default=STATE_FILE, help="Fortschrittsdatei für Wiederaufnahme")
+    parser.add_argument("--parallel", type=int, default=PARALLEL_JOBS, help="gleichzeitige Jobs")
+    parser.add_argument("--workers", type=int, default=None, help="Größe des Worker-Pools")
+    parser.add_argument("--retry-failed", action="store_true", help="fehlgeschlagene Jobs erneut versuchen")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args)
+    if not jobs:
+        parser.error("keine Jobs angegeben")
+
+    set_start_method("spawn", force=True)
+    if args.workers:
+        pipeline.POOL_WORKERS = args.workers
+    sys.stdout = _JobPrefixWriter(sys.stdout)
+
+    summary = run_batch(jobs, args.state, args.parallel, args.retry_failed)
+    pipeline.write_metrics()
+    print(f"✅ {summary['done']} fertig, ❌ {summary['failed']} fehlgeschlagen, ⏭️ {summary['skipped']} übersprungen")
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Benchmark der PDF-Pipeline auf reproduzierbaren, synthetischen Korpora.
+
+Beispiele:
+    python3 compress_pdf_benchmark.py --save benchmark_baseline.json
+    python3 compress_pdf_benchmark.py --compare benchmark_baseline.json
+    python3 compress_pdf_benchmark.py --corpus large --scale 4
+
+Exit-Code 1, wenn in einem Fall Ausgaben fehlen (eine schnelle, aber gescheiterte
+Kompression ist keine Verbesserung) und mit --compare zusätzlich, wenn ein Fall
+langsamer als die Baseline (plus Toleranz) ist oder mehr JPEG-Kodierungen braucht.
+
+Jeder Fall läuft in einem eigenen Prozess, damit der Spitzen-RSS (ru_maxrss
+ist ein Lebenszeit-Maximum) nur diesen Fall misst.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFilter
+from pypdf import PdfWriter
+from multiprocessing import get_context
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject, StreamObject
+
+import compress_pdf_group as pipeline
+
+# === KORPORA ===
+# docs: Anzahl Dateien, pages: Seiten je Datei (min, max), kinds: Seitenarten
+CORPORA = {
+    "small": {"docs": 4, "pages": (1, 3), "kinds": ("text", "photo", "vector")},
+    "text": {"docs": 10, "pages": (2, 10), "kinds": ("text",)},
+    "photo": {"docs": 6, "pages": (1, 6), "kinds": ("photo",)},
+    "mixed": {"docs": 12, "pages": (1, 20), "kinds": ("text", "photo", "vector")},
+    # Fotos mit Transparenzmaske: nicht neu kodierbar, laufen also auch mit Seitenanalyse durch poppler
+    "masked": {"docs": 4, "pages": (1, 6), "kinds": ("masked", "text")},
+    "large": {"docs": 8, "pages": (100, 400), "kinds": ("text", "text", "photo", "vector")},
+}
+DEFAULT_CORPORA = ["small", "text", "photo", "mixed", "masked"]
+SCAN_DPI = 200
+A4_PIXELS = (1654, 2339)  # A4 @ 200 DPI
+BENCH_QUALITY = 70
+BENCH_DPI = 150
+
+# === SEITENGENERATOREN ===
+def make_text_page(rng):
+    """Textscan: Wortblöcke in Zeilen auf leicht verrauschtem Papier."""
+    img = Image.new("L", A4_PIXELS, 255)
+    draw = ImageDraw.Draw(img)
+    y = 160
+    while y < A4_PIXELS[1] - 160:
+        x = 150
+        line_end = A4_PIXELS[0] - rng.randint(150, 500)
+        while x < line_end:
+            width = rng.randint(30, 150)
+            draw.rectangle([x, y, x + width, y + 22], fill=rng.randint(0, 70))
+            x += width + rng.randint(18, 30)
+        y += rng.choice((44, 48, 96))
+    grain = Image.frombytes("L", A4_PIXELS, rng.randbytes(A4_PIXELS[0] * A4_PIXELS[1]))
+    return Image.blend(img, grain, 0.06)
+
+def make_photo_page(rng):
+    """Foto: weiche Farbflächen plus Korn."""
+    img = Image.new("RGB", A4_PIXELS, tuple(rng.randint(0, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = rng.randint(-200, A4_PIXELS[0]), rng.randint(-200, A4_PIXELS[1])
+        size = rng.randint(100, 900)
+        draw.ellipse([x, y, x + size, y + size], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    img = img.filter(ImageFilter.GaussianBlur(12))
+    grain = Image.frombytes("RGB", A4_PIXELS, rng.randbytes(A4_PIXELS[0] * A4_PIXELS[1] * 3))
+    return Image.blend(img, grain, 0.1)
+
+def add_vector_page(writer, rng):
+    """Reine Vektorseite mit Helvetica-Text (klein, wird von der Analyse übernommen)."""
+    page = writer.add_blank_page(width=595, height=842)
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+    })
+    words = ("Anlage", "Vertrag", "Seite", "gemäß", "Absatz", "Frist", "Datum", "Betrag")
+    lines = [" ".join(rng.choice(words) for _ in range(rng.randint(6, 12))) for _ in range(45)]
+    text = " ".join(f"({line}) '" for line in lines)
+    content = StreamObject()
+    content.set_data(f"BT /F1 11 Tf 14 TL 60 790 Td {text} ET".encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(content)
+
+def add_masked_page(writer, rng):
+    """Foto mit /SMask: die Seitenanalyse darf es nicht direkt neu kodieren und rastert die Seite."""
+    pipeline.add_jpeg_page(writer, make_photo_page(rng), 90, SCAN_DPI)
+    image = writer.pages[-1]["/Resources"]["/XObject"]["/Im0"].get_object()
+    width, height = A4_PIXELS[0] // 8, A4_PIXELS[1] // 8
+    mask = DecodedStreamObject()
+    mask.set_data(bytes(255 - (x * 255 // width) // 2 for _ in range(height) for x in range(width)))
+    mask = mask.flate_encode()
+    mask.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(width),
+        NameObject("/Height"): NumberObject(height),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    image[NameObject("/SMask")] = writer._add_object(mask)
+
+def generate_corpus(name, target_dir, scale=1, seed=1234):
+    """Schreibt das Korpus `name` samt Inhaltsverzeichnis.md nach `target_dir` (vorher geleert)."""
+    spec = CORPORA[name]
+    rng = random.Random(f"{seed}-{name}")
+    # Reste früherer Läufe (mit --workdir) würden sonst als zusätzliche Eingaben mitgemessen
+    shutil.rmtree(target_dir, ignore_errors=True)
+    target_dir.mkdir(parents=True)
+    files = []
+    total_pages = 0
+    for index in range(spec["docs"] * scale):
+        writer = PdfWriter()
+        for _ in range(rng.randint(*spec["pages"])):
+            kind = rng.choice(spec["kinds"])
+            if kind == "vector":
+                add_vector_page(writer, rng)
+            elif kind == "masked":
+                add_masked_page(writer, rng)
+            else:
+                img = make_text_page(rng) if kind == "text" else make_photo_page(rng)
+                pipeline.add_jpeg_page(writer, img, 90, SCAN_DPI)
+            total_pages += 1
+        filename = f"{index:04d}.pdf"
+        writer.write(target_dir / filename)
+        files.append(filename)
+
+    # Drei zusammenhängende Abschnitte (die Zuordnung erfolgt über die Position), damit
+    # auch die Gruppierung etwas zu tun hat
+    chunk = max(1, -(-len(files) // 3))
+    with open(target_dir / "Inhaltsverzeichnis.md", "w", encoding="utf-8") as f:
+        for number, start in enumerate(range(0, len(files), chunk), start=1):
+            f.write(f"- Abschnitt {number}:\n")
+            for entry in files[start:start + chunk]:
+                f.write(f"  - {entry}\n")
+    return total_pages
+
+# === MESSUNG ===
+def children_peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def reset_caches(work_dir):
+    pipeline.RASTER_CACHE.clear()
+    shutil.rmtree(work_dir / "raster_cache", ignore_errors=True)
+    pipeline._page_plans.clear()
+
+def measure(func, pages, work_dir):
+    """Führt `func` mit kalten Caches aus; Worker werden danach beendet, damit ihr RSS zählt.
+
+    `func` liefert die Anzahl fehlgeschlagener Ausgaben (None: keine).
+    """
+    reset_caches(work_dir)
+    pipeline.metrics.reset()
+    start = time.perf_counter()
+    failed = func() or 0
+    seconds = time.perf_counter() - start
+    pipeline.shutdown_pool()
+    return {
+        "seconds": round(seconds, 4),
+        "failed": failed,
+        "pages": pages,
+        "pages_per_second": round(pages / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(pipeline.peak_rss_mb() or 0, 1),
+        "worker_peak_rss_mb": round(children_peak_rss_mb() or 0, 1),
+        "encodes": pipeline.COUNTERS["jpeg_encodes"],
+        "poppler_renders": pipeline.COUNTERS["poppler_renders"],
+        "downsamples": pipeline.COUNTERS["downsamples"],
+        "stages": {name: round(seconds, 4) for name, _, seconds in pipeline.metrics.summary(limit=None)},
+    }
+
+def configure_pipeline(corpus_dir, work_dir):
+    """Leitet alle Pfade der Pipeline in das Benchmark-Verzeichnis um."""
+    pipeline.SCRIPT_DIR = corpus_dir
+    pipeline.TMP_DIR = corpus_dir / "tmp_pdf_pages"
+    pipeline.SEND_TO = corpus_dir / "Senden"
+    pipeline.RESULT_CACHE_MB = 0
+    pipeline.RASTER_CACHE_DIR = work_dir / "raster_cache"
+    pipeline.RASTER_CACHE.disk_dir = pipeline.RASTER_CACHE_DIR
+    os.chdir(corpus_dir)
+
+# === FÄLLE ===
+# Jeder Fall läuft in einem frischen Prozess und liest seine Eingaben aus dem Korpus- bzw. Arbeitsverzeichnis;
+# Rückgabe: Anzahl fehlgeschlagener Ausgaben
+def compress_all(work_dir, out_name="compressed"):
+    out_dir = work_dir / out_name
+    out_dir.mkdir(exist_ok=True)
+    return sum(pipeline.compress_pdf_with_quality_and_dpi(pdf, BENCH_QUALITY, BENCH_DPI, out_dir) is None
+               for pdf in pipeline.get_ordered_pdfs())
+
+def compress_raster_only(work_dir):
+    # PAGE_ANALYSIS ist aus (siehe CASES): jede Seite geht durch poppler, Raster-Cache und Herunterrechnen
+    return compress_all(work_dir, "compressed_raster")
+
+def merge_all(work_dir):
+    compressed = [work_dir / "compressed" / f"compressed_{Path(pdf).name}" for pdf in pipeline.get_ordered_pdfs()]
+    pipeline.merge_pdfs([str(path) for path in compressed], work_dir / "merged.pdf")
+
+def outline_all(work_dir):
+    pipeline.add_outline(work_dir / "merged.pdf", pipeline.parse_bookmark_structure(), pipeline.get_ordered_pdfs())
+
+def run_main(work_dir):
+    return 0 if pipeline.main() else 1
+
+def compress_groups(work_dir):
+    pipeline.TMP_DIR.mkdir(parents=True, exist_ok=True)
+    # Ausgaben ins Arbeitsverzeichnis: im Korpusordner wären sie beim nächsten Lauf Eingaben
+    out_dir = work_dir / "groups"
+    out_dir.mkdir(exist_ok=True)
+    structure = pipeline.parse_bookmark_structure()
+    grouped = pipeline.group_pdfs_by_structure(pipeline.get_ordered_pdfs(), structure)
+    return sum(pipeline.compress_group(grouped[title], title, structure,
+                                       out_file=out_dir / f"Anlagen-{pipeline.group_file_suffix(title)}.pdf") is None
+               for title, _ in structure if title in grouped)
+
+# Fall → (Funktion, PAGE_ANALYSIS); die Reihenfolge zählt (merge_pdfs liest die Ausgabe von compress_...)
+CASES = {
+    "compress_pdf_with_quality_and_dpi": (compress_all, True),
+    "compress_raster_only": (compress_raster_only, False),
+    "merge_pdfs": (merge_all, True),
+    "add_outline": (outline_all, True),
+    "main": (run_main, True),
+    "compress_group": (compress_groups, True),
+}
+
+def measure_case(case, corpus_dir, work_dir, pages):
+    func, page_analysis = CASES[case]
+    configure_pipeline(corpus_dir, work_dir)
+    pipeline.PAGE_ANALYSIS = page_analysis
+    return measure(lambda: func(work_dir), pages, work_dir)
+
+def _isolated_entry(connection, args):
+    try:
+        connection.send(measure_case(*args))
+    except BaseException as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+def measure_isolated(case, corpus_dir, work_dir, pages):
+    """measure_case in einem eigenen spawn-Prozess (nicht als Daemon, er startet selbst den Worker-Pool)."""
+    ctx = get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_isolated_entry, args=(sender, (case, corpus_dir, work_dir, pages)))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = RuntimeError(f"Fall '{case}' ohne Ergebnis beendet (Exit-Code {process.exitcode})")
+    process.join()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+def run_corpus(name, root, scale, seed):
+    corpus_dir = root / name
+    work_dir = root / f"{name}_work"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🧪 Erzeuge Korpus '{name}' (Skalierung {scale})...")
+    pages = generate_corpus(name, corpus_dir, scale, seed)
+
+    results = {case: measure_isolated(case, corpus_dir, work_dir, pages) for case in CASES}
+    for case, metrics in results.items():
+        print(f"  ⏱️ {case}: {metrics['seconds']:.2f} s, {metrics['pages_per_second']} Seiten/s, "
+              f"{metrics['encodes']} Kodierungen, {metrics['poppler_renders']} poppler-Renderings, "
+              f"RSS {metrics['peak_rss_mb']:.0f}/{metrics['worker_peak_rss_mb']:.0f} MB")
+        if metrics["failed"]:
+            print(f"  ❌ {case}: {metrics['failed']} Ausgabe(n) fehlgeschlagen")
+    return results
+
+# === BASELINE ===
+def failures(results):
+    """Fälle mit fehlgeschlagenen Ausgaben – ihre Zeiten taugen nicht als Messwert."""
+    return [f"{corpus}/{case}: {metrics['failed']} Ausgabe(n) fehlgeschlagen"
+            for corpus, cases in results.items() for case, metrics in cases.items() if metrics.get("failed")]
+
+def compare(results, baseline, tolerance):
+    """Liste der Regressionen gegenüber `baseline` (Laufzeit über Toleranz, mehr Kodierungen)."""
+    regressions = []
+    for corpus, cases in results.items():
+        for case, metrics in cases.items():
+            base = baseline.get("results", {}).get(corpus, {}).get(case)
+            if not base:
+                continue
+            if metrics["seconds"] > base["seconds"] * (1 + tolerance):
+                regressions.append(f"{corpus}/{case}: {metrics['seconds']:.2f} s statt {base['seconds']:.2f} s")
+            if metrics["encodes"] > base["encodes"]:
+                regressions.append(f"{corpus}/{case}: {metrics['encodes']} statt {base['encodes']} Kodierungen")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der PDF-Kompression auf synthetischen Korpora")
+    parser.add_argument("--corpus", default=",".join(DEFAULT_CORPORA),
+                        help=f"Kommagetrennt aus {', '.join(CORPORA)}")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplikator für die Dateianzahl")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workdir", type=Path, help="Arbeitsverzeichnis (Standard: temporär)")
+    parser.add_argument("--save", type=Path, help="Ergebnisse als JSON-Baseline speichern")
+    parser.add_argument("--compare", type=Path, help="Gegen JSON-Baseline prüfen")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Erlaubte Verlangsamung (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.corpus.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CORPORA]
+    if unknown:
+        parser.error(f"Unbekannte Korpora: {', '.join(unknown)}")
+
+    # Die Messprozesse wechseln ins Korpusverzeichnis – Pfade vorher absolut machen
+    save_path = args.save.resolve() if args.save else None
+    compare_path = args.compare.resolve() if args.compare else None
+    root = (args.workdir or Path(tempfile.mkdtemp(prefix="pdf_benchmark_"))).resolve()
+    results = {name: run_corpus(name, root, args.scale, args.seed) for name in names}
+    if not args.workdir:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "results": results,
+    }
+    if save_path:
+        save_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"💾 Baseline gespeichert: {save_path}")
+
+    failed = failures(results)
+    if failed:
+        print("❌ Fehlgeschlagene Fälle:")
+        for line in failed:
+            print(f"  - {line}")
+
+    if compare_path:
+        baseline = json.loads(compare_path.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressionen:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("✅ Keine Regression gegenüber der Baseline.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,34 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import json
+import math
+import mmap
+import time
+import atexit
+import heapq
 import shutil
+import hashlib
+import threading
+import tempfile
+import subprocess
+from io import BytesIO
 from pathlib import Path
-from PyPDF2 import PdfMerger
 from pdf2image import convert_from_path
 from PIL import Image
-from multiprocessing import Pool, cpu_count, set_start_method, get_context
+import multiprocessing
+from multiprocessing import cpu_count, set_start_method, get_context
 from pypdf import PdfWriter, PdfReader
-from collections import defaultdict
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+from collections import defaultdict, OrderedDict, Counter
 from itertools import product
+import compress_pdf_metrics as metrics
+from compress_pdf_metrics import COUNTERS, timed
 
 # === BASISPFAD DER DATEI ===
+# Standard-Eingabeordner; alle Funktionen arbeiten mit absoluten Pfaden (kein chdir beim Import)
 SCRIPT_DIR = Path(__file__).resolve().parent / "Pdf"
-os.chdir(SCRIPT_DIR)
 
 # === PARAMETER ===
 MAX_SIZE_MB = 1.9
@@ -21,48 +36,1005 @@ MAX_SIZE_BYTES = MAX_SIZE_MB * 1024 * 1024
 TMP_DIR = SCRIPT_DIR / "tmp_pdf_pages"
 OUTPUT_FILE = "Anlagen.pdf"
 SEND_TO = SCRIPT_DIR / "../Senden"
+DPI_VALUES = [100, 150, 200, 250, 300]
+QUALITY_VALUES = [50, 55, 60, 65, 70, 75, 80, 85]
+# Gerenderte Seiten je (Datei-Hash, Seite, DPI): im RAM und als mmap-Rohdaten auf der Platte.
+# Beide Budgets gelten für alle Worker zusammen (RAM wird beim Pool-Start aufgeteilt).
+RASTER_CACHE_MEMORY_MB = 512
+RASTER_CACHE_DISK_MB = 2048
+RASTER_CACHE_DIR = TMP_DIR / "raster_cache"
+# Seiten nur einmal mit RENDER_DPI rastern und kleinere DPI per Pillow herunterrechnen;
+# None: höchste DPI der laufenden Suche (siehe render_dpi_for), wird je Aufgabe an die Worker gereicht.
+# EXACT_RASTER = True rendert jede DPI einzeln mit poppler (bitgenaue Ausgabe).
+RENDER_DPI = None
+EXACT_RASTER = False
+# Filter (Name aus PIL.Image.Resampling) und reducing_gap für das Herunterrechnen
+DOWNSAMPLE_FILTER = "LANCZOS"
+DOWNSAMPLE_REDUCING_GAP = 2.0
+# Seitenbereiche als Arbeitseinheiten: ca. UNITS_PER_WORKER Einheiten je Worker, mindestens MIN_UNIT_PAGES Seiten
+UNITS_PER_WORKER = 4
+MIN_UNIT_PAGES = 4
+# Größe des persistenten Worker-Pools (None: cpu_count())
+POOL_WORKERS = None
+# Größenmodell für das gemergte PDF: JPEG-Streams + Container-Overhead (gemessen mit merge_pdfs)
+PAGE_OVERHEAD_BYTES = 480
+PDF_OVERHEAD_BYTES = 1024
+# Adaptive Qualität je Seite statt eines globalen Qualitätswerts; Kurven werden nur an
+# CURVE_QUALITIES gemessen und dazwischen linear interpoliert
+ADAPTIVE_QUALITY = False
+CURVE_QUALITIES = [50, 60, 70, 80, 85]
+# Vorab-Analyse mit pypdf: Seiten unter PAGE_BUDGET_BYTES unverändert übernehmen, bei
+# bildlastigen Seiten nur die eingebetteten Bilder neu kodieren, sonst rastern
+PAGE_ANALYSIS = True
+PAGE_BUDGET_BYTES = 40 * 1024
+# Kompressions-Engines: "ghostscript" rechnet Bilder in der Datei herunter (Text bleibt Vektor),
+# "raster" ist der pdf2image/JPEG-Pfad. Die Suche probiert sie in dieser Reihenfolge.
+ENGINE_ORDER = ["ghostscript", "raster"]
+GHOSTSCRIPT = shutil.which("gs") or shutil.which("gswin64c")
+GHOSTSCRIPT_TIMEOUT = 600
+# Komprimierte Einzeldateien je (Datei-Hash, DPI, Qualität) über Läufe hinweg (0: aus)
+RESULT_CACHE_DIR = SCRIPT_DIR / ".compress_cache"
+RESULT_CACHE_MB = 1024
+# Parameter, die beim Start des Pools an die Worker übergeben werden (spawn importiert neu)
+WORKER_SETTINGS = (
+    "EXACT_RASTER", "DOWNSAMPLE_FILTER", "DOWNSAMPLE_REDUCING_GAP", "PAGE_ANALYSIS", "PAGE_BUDGET_BYTES",
+    "RASTER_CACHE_MEMORY_MB", "RASTER_CACHE_DISK_MB", "RASTER_CACHE_DIR",
+    "GHOSTSCRIPT", "GHOSTSCRIPT_TIMEOUT", "TRACE_FILE", "PROFILE_FILE",
+)
+
+# Messung (compress_pdf_metrics): Stufenzeiten und Zähler laufen immer mit;
+# Trace-Datei (chrome://tracing, Perfetto) und cProfile-Dump nur, wenn ein Pfad gesetzt ist
+TRACE_FILE = None      # z. B. SCRIPT_DIR / "trace.json"
+PROFILE_FILE = None    # z. B. SCRIPT_DIR / "profile.pstats"
 
 # === 1. PDF-Dateien laden ===
-def get_ordered_pdfs():
-    pdfs = [f for f in os.listdir() if f.endswith(".pdf") and f != OUTPUT_FILE and not f.startswith("temp_")]
+@timed()
+def get_ordered_pdfs(source_dir=None):
+    """Alle PDFs des Ordners (Standard: SCRIPT_DIR) als absolute Pfade, nach Dateiname sortiert."""
+    source_dir = Path(source_dir or SCRIPT_DIR).resolve()
+    pdfs = [f for f in os.listdir(source_dir) if f.endswith(".pdf") and f != OUTPUT_FILE and not f.startswith("temp_")]
     pdfs.sort()
-    return pdfs
+    return [str(source_dir / f) for f in pdfs]
+
+# === RASTER-CACHE ===
+_file_hashes = {}
+_page_counts = {}
+
+@timed()
+def file_hash(path):
+    """SHA-1 des Dateiinhalts, gemerkt pro (Pfad, Größe, mtime)."""
+    stat = os.stat(path)
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+@timed()
+def count_pages(pdf_path):
+    digest = file_hash(pdf_path)
+    if digest not in _page_counts:
+        _page_counts[digest] = len(PdfReader(pdf_path).pages)
+    return _page_counts[digest]
+
+class RasterCache:
+    """LRU-Cache für gerenderte Seiten mit Speicherbudget.
+
+    Verdrängte Seiten bleiben als Rohdaten (Kopfzeile `mode breite höhe`) im
+    Plattenordner liegen, werden per mmap zurückgelesen und ebenfalls nach
+    LRU (mtime) auf `disk_budget` Bytes begrenzt. Der Plattenordner wird von
+    allen Pool-Workern geteilt; gezählt wird er nur beim ersten Schreiben,
+    wenn die eigene Buchführung das Budget erreicht oder alle
+    DISK_SCAN_INTERVAL Schreibvorgänge (die anderen Worker schreiben mit).
+    Verdrängt wird bis DISK_EVICT_TARGET des Budgets, damit nicht jeder
+    weitere Schreibvorgang erneut den Ordner durchsucht.
+    """
+
+    DISK_SCAN_INTERVAL = 64
+    DISK_EVICT_TARGET = 0.9
+
+    def __init__(self, memory_budget, disk_dir=None, disk_budget=0):
+        self.memory_budget = memory_budget
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_budget = disk_budget
+        self.memory_used = 0
+        self.disk_used = None
+        self._stores_since_scan = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @timed("raster_cache_get")
+    def get(self, key):
+        img = self._entries.get(key)
+        if img is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img
+        img = self._load(key)
+        if img is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, img)
+        return img
+
+    @timed("raster_cache_put")
+    def put(self, key, img, persist=True):
+        self._remember(key, img)
+        if persist:
+            self._store(key, img)
+
+    def clear(self):
+        self._entries.clear()
+        self.memory_used = 0
+
+    @staticmethod
+    def _image_bytes(img):
+        return img.width * img.height * len(img.getbands())
+
+    def _remember(self, key, img):
+        size = self._image_bytes(img)
+        if size > self.memory_budget:
+            return
+        if key in self._entries:
+            self.memory_used -= self._image_bytes(self._entries.pop(key))
+        self._entries[key] = img
+        self.memory_used += size
+        while self.memory_used > self.memory_budget:
+            _, old = self._entries.popitem(last=False)
+            self.memory_used -= self._image_bytes(old)
+
+    def _disk_path(self, key):
+        # (Hash, Seite, DPI) exakt gerendert, heruntergerechnet zusätzlich mit Quelle und Filter
+        return self.disk_dir / f"{'_'.join(map(str, key))}.raw"
+
+    def _load(self, key):
+        if not self.disk_dir or not self.disk_budget:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header_end = mm.find(b"\n")
+                mode, width, height = mm[:header_end].decode().split()
+                img = Image.frombytes(mode, (int(width), int(height)), mm[header_end + 1:])
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return img
+
+    def _store(self, key, img):
+        if not self.disk_dir or not self.disk_budget:
+            return
+        if self._image_bytes(img) > self.disk_budget:
+            return
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(f"{img.mode} {img.width} {img.height}\n".encode())
+            f.write(img.tobytes())
+        os.replace(tmp_path, path)
+
+        self._stores_since_scan += 1
+        if self.disk_used is not None:
+            self.disk_used += path.stat().st_size
+        if (self.disk_used is None or self.disk_used > self.disk_budget
+                or self._stores_since_scan >= self.DISK_SCAN_INTERVAL):
+            self._evict_disk()
+
+    def _evict_disk(self):
+        self._stores_since_scan = 0
+        entries = []
+        for path in self.disk_dir.glob("*.raw"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                pass
+        total = sum(stat.st_size for stat, _ in entries)
+        if total > self.disk_budget:
+            for stat, path in sorted(entries, key=lambda e: e[0].st_mtime_ns):
+                if total <= self.disk_budget * self.DISK_EVICT_TARGET:
+                    break
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+        self.disk_used = total
+
+RASTER_CACHE = RasterCache(
+    RASTER_CACHE_MEMORY_MB * 1024 * 1024,
+    RASTER_CACHE_DIR,
+    RASTER_CACHE_DISK_MB * 1024 * 1024,
+)
+
+@timed()
+def render_page_exact(pdf_path, page, dpi):
+    """Eine Seite (0-basiert) als PIL-Bild; nur bei Cache-Fehlschlag wird poppler bemüht."""
+    key = (file_hash(pdf_path), page, dpi)
+    img = RASTER_CACHE.get(key)
+    if img is None:
+        img = convert_from_path(pdf_path, dpi=dpi, first_page=page + 1, last_page=page + 1)[0]
+        COUNTERS["poppler_renders"] += 1
+        RASTER_CACHE.put(key, img)
+    return img
+
+@timed()
+def downsample(img, from_dpi, to_dpi):
+    size = (max(1, round(img.width * to_dpi / from_dpi)), max(1, round(img.height * to_dpi / from_dpi)))
+    COUNTERS["downsamples"] += 1
+    # reducing_gap: erst ganzzahlig per Box-Filter verkleinern (Pyramide), dann DOWNSAMPLE_FILTER
+    return img.resize(size, Image.Resampling[DOWNSAMPLE_FILTER], reducing_gap=DOWNSAMPLE_REDUCING_GAP)
+
+def render_dpi_for(dpi_values):
+    """Render-Auflösung für eine Suche über `dpi_values`: höher zu rendern wäre verschenkt."""
+    return RENDER_DPI or max(dpi_values)
+
+# Render-Auflösung der laufenden Worker-Aufgabe (compress_unit/measure_unit setzen sie)
+_task_render_dpi = None
+
+@timed()
+def render_page(pdf_path, page, dpi):
+    """Seite in `dpi`; unterhalb der Render-Auflösung aus dem einmaligen Hochrender abgeleitet."""
+    render_dpi = _task_render_dpi or RENDER_DPI or dpi
+    if EXACT_RASTER or dpi >= render_dpi:
+        return render_page_exact(pdf_path, page, dpi)
+
+    # Eigener Schlüssel: sonst lieferte der Cache das exakte Bild gleicher DPI oder ein Downsample
+    # aus einer anderen Render-Auflösung
+    key = (file_hash(pdf_path), page, dpi, render_dpi, DOWNSAMPLE_FILTER, DOWNSAMPLE_REDUCING_GAP)
+    img = RASTER_CACHE.get(key)
+    if img is None:
+        img = downsample(render_page_exact(pdf_path, page, render_dpi), render_dpi, dpi)
+        # Herunterrechnen ist billiger als Rohdaten auf die Platte zu schreiben
+        RASTER_CACHE.put(key, img, persist=False)
+    return img
+
+# === Speicherbedarf der Worker ===
+def peak_rss_mb():
+    """Spitzen-RSS des aktuellen Prozesses in MB (None, wenn nicht ermittelbar)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KiB, macOS Byte
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 / 1024
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def pool_size_for_memory(worker_peak_mb):
+    """Poolgröße, die bei `worker_peak_mb` je Worker in den verfügbaren Speicher passt."""
+    available = available_memory_mb()
+    if not worker_peak_mb or not available:
+        return cpu_count()
+    return max(1, min(cpu_count(), int(available // worker_peak_mb)))
+
+# === JPEG-Seite direkt als Bild-XObject ===
+@timed()
+def encode_jpeg(img, quality):
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    COUNTERS["jpeg_encodes"] += 1
+    return img, buffer.getvalue()
+
+def jpeg_xobject(img, data):
+    image = StreamObject()
+    image.set_data(data)
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(img.width),
+        NameObject("/Height"): NumberObject(img.height),
+        NameObject("/ColorSpace"): NameObject("/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/DCTDecode"),
+    })
+    return image
+
+@timed()
+def add_jpeg_page(writer, img, quality, dpi):
+    """Hängt `img` als DCTDecode-Bild an – ohne Zwischendateien und ohne erneutes Dekodieren.
+
+    Die Seitengröße entspricht der Originalgröße (Pixel * 72 / DPI).
+    Rückgabe: Größe des JPEG-Streams in Byte.
+    """
+    img, data = encode_jpeg(img, quality)
+    width_pt = img.width * 72 / dpi
+    height_pt = img.height * 72 / dpi
+
+    image = jpeg_xobject(img, data)
+    content = StreamObject()
+    content.set_data(f"q {width_pt:.4f} 0 0 {height_pt:.4f} 0 0 cm /Im0 Do Q".encode())
+
+    page = writer.add_blank_page(width=width_pt, height=height_pt)
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): writer._add_object(image)}),
+    })
+    page[NameObject("/Contents")] = writer._add_object(content)
+    return len(data)
+
+# === VORAB-ANALYSE DER SEITEN ===
+_page_plans = {}
+
+def _stream_length(obj):
+    # pypdf entfernt /Length beim Einlesen; _data enthält die noch kodierten Bytes
+    return len(getattr(obj, "_data", b""))
+
+def _collect_streams(obj, streams, visited):
+    """Sammelt alle von `obj` aus erreichbaren Streams als `{(idnum, generation): bytes}`."""
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in visited:
+            return
+        visited.add(key)
+        obj = obj.get_object()
+        if isinstance(obj, StreamObject):
+            streams[key] = _stream_length(obj)
+    # Streams sind auch Dictionaries: Formulare bringen eigene /Resources mit
+    if isinstance(obj, DictionaryObject):
+        for name, value in obj.items():
+            if name != "/Parent":
+                _collect_streams(value, streams, visited)
+    elif isinstance(obj, ArrayObject):
+        for value in obj:
+            _collect_streams(value, streams, visited)
+
+def page_streams(page):
+    """Inhalts- und Ressourcen-Streams einer Seite: Bilder, Formulare, Schriften, ICC-Profile, Muster, ..."""
+    streams = {}
+    visited = set()
+    for name in ("/Contents", "/Resources"):
+        if name in page:
+            _collect_streams(page.raw_get(name), streams, visited)
+    return streams
+
+def _xobjects(page):
+    resources = page.get("/Resources")
+    if resources is None:
+        return None
+    xobjects = resources.get_object().get("/XObject")
+    return xobjects.get_object() if xobjects is not None else None
+
+def _single_filter(image):
+    filters = image.get("/Filter")
+    if isinstance(filters, ArrayObject):
+        return filters[0] if len(filters) == 1 else None
+    return filters
+
+def _reencodable(image):
+    """Nur einfache 8-Bit-RGB/Grau-Bilder ohne Masken werden direkt neu kodiert."""
+    return (_single_filter(image) in ("/DCTDecode", "/FlateDecode")
+            and image.get("/BitsPerComponent") == 8
+            and image.get("/ColorSpace") in ("/DeviceRGB", "/DeviceGray")
+            and not image.get("/ImageMask")
+            and all(key not in image for key in ("/SMask", "/Mask", "/Decode")))
+
+@timed()
+def analyze_page(page, streams=None, shares=None):
+    """Ordnet eine Seite einem Pfad zu: `(art, bytes)` mit art passthrough/reencode/raster.
+
+    `bytes` umfasst alle Streams der Seite. Ressourcen, die sich mehrere Seiten
+    teilen (`shares`: Stream → Anzahl Seiten), zählen anteilig, sodass die
+    Summe über das Dokument jede Ressource genau einmal enthält.
+    """
+    if streams is None:
+        streams = page_streams(page)
+    size = round(sum(length / (shares[key] if shares else 1) for key, length in streams.items()))
+    images = reencodable = 0
+    complex_content = False
+    xobjects = _xobjects(page) or {}
+    for name in xobjects:
+        obj = xobjects[name].get_object()
+        if obj.get("/Subtype") == "/Image":
+            images += 1
+            reencodable += _reencodable(obj)
+        else:
+            # Formulare können verschachtelte Bilder enthalten – nicht gezielt neu kodierbar
+            complex_content = True
+
+    if size <= PAGE_BUDGET_BYTES:
+        return "passthrough", size
+    if images and reencodable == images and not complex_content:
+        return "reencode", size
+    return "raster", size
+
+@timed()
+def page_plan(pdf_path, reader=None):
+    digest = file_hash(pdf_path)
+    if digest not in _page_plans:
+        reader = reader or PdfReader(pdf_path)
+        streams = [page_streams(page) for page in reader.pages]
+        shares = Counter(key for found in streams for key in found)
+        _page_plans[digest] = [analyze_page(page, found, shares) for page, found in zip(reader.pages, streams)]
+    return _page_plans[digest]
+
+@timed()
+def reencode_page_images(writer, page, quality, dpi, reencoded):
+    """Kodiert die Bilder einer (bereits in `writer` kopierten) Seite mit `quality` neu.
+
+    Bilder über `dpi` werden herunterskaliert; wird ein Bild nicht kleiner, bleibt
+    das Original. `reencoded` verhindert doppeltes Kodieren geteilter Ressourcen.
+    Rückgabe: eingesparte Bytes gegenüber den Original-Bildern.
+    """
+    saved = 0
+    page_width_inch = float(page.mediabox.width) / 72
+    xobjects = _xobjects(page) or {}
+    for name in list(xobjects):
+        ref = xobjects.raw_get(name)
+        obj = ref.get_object()
+        if ref.idnum in reencoded:
+            continue
+        raw = obj.get_data()
+        if _single_filter(obj) == "/DCTDecode":
+            img = Image.open(BytesIO(raw))
+            img.load()
+        else:
+            mode = "RGB" if obj["/ColorSpace"] == "/DeviceRGB" else "L"
+            img = Image.frombytes(mode, (int(obj["/Width"]), int(obj["/Height"])), raw)
+
+        effective_dpi = img.width / page_width_inch
+        if effective_dpi > dpi:
+            img = downsample(img, effective_dpi, dpi)
+        img, data = encode_jpeg(img, quality)
+        if len(data) >= _stream_length(obj):
+            continue
+        saved += _stream_length(obj) - len(data)
+        # Objekt an Ort und Stelle ersetzen, sonst schreibt der Writer das Original verwaist mit
+        writer._replace_object(ref, jpeg_xobject(img, data))
+        reencoded.add(ref.idnum)
+    return saved
+
+@timed()
+def encode_page(writer, pdf_path, page_number, quality, dpi, reader=None, reencoded=None):
+    """Hängt eine Seite über den günstigsten Pfad an `writer` an.
+
+    Rückgabe: `(art, stream_bytes)`; gerastert wird nur, wenn Übernahme oder
+    Bild-Neukodierung nicht in Frage kommen (oder PAGE_ANALYSIS aus ist).
+    """
+    kind = "raster"
+    if PAGE_ANALYSIS and reader is not None:
+        kind, size = page_plan(pdf_path, reader)[page_number]
+        if kind == "passthrough":
+            writer.add_page(reader.pages[page_number])
+            return kind, size
+        if kind == "reencode":
+            page = writer.add_page(reader.pages[page_number])
+            try:
+                saved = reencode_page_images(writer, page, quality, dpi, reencoded if reencoded is not None else set())
+                return kind, max(0, size - saved)
+            except Exception:
+                del writer.pages[-1]
+                kind = "raster"
+    return kind, add_jpeg_page(writer, render_page(pdf_path, page_number, dpi), quality, dpi)
 
 # === 2. Komprimiere PDF-Datei intelligent ===
-def compress_pdf_with_quality_and_dpi(pdf_path, quality, dpi, temp_dir):
-    output_pdf_path = temp_dir / f"compressed_{Path(pdf_path).name}"
+def range_output_path(pdf_path, temp_dir, first_page=None, last_page=None):
+    if first_page is None:
+        return temp_dir / f"compressed_{Path(pdf_path).name}"
+    return temp_dir / f"compressed_{Path(pdf_path).stem}_p{first_page}-{last_page}.pdf"
+
+@timed()
+def compress_pdf_with_quality_and_dpi(pdf_path, quality, dpi, temp_dir, first_page=None, last_page=None, stats=None,
+                                      page_qualities=None, engine="raster"):
+    """Komprimiert `pdf_path` (optional nur `first_page`..`last_page`, 0-basiert, inklusive).
+
+    `engine` wählt das Verfahren aus ENGINES; Seitenqualitäten (adaptive
+    Qualität) beherrscht nur die Raster-Engine. `stats` erhält Seiten,
+    Stream-Bytes und die Anzahl der Seiten je Pfad. Rückgabe: Pfad oder None.
+    """
+    if page_qualities:
+        engine = "raster"
+    return ENGINES[engine](pdf_path, quality, dpi, temp_dir, first_page, last_page, stats, page_qualities)
+
+@timed()
+def compress_raster(pdf_path, quality, dpi, temp_dir, first_page=None, last_page=None, stats=None,
+                    page_qualities=None):
+    """Raster-Engine: Seite für Seite übernehmen, Bilder neu kodieren oder als JPEG rastern.
+
+    Die Seiten werden einzeln gestreamt: jede Seite ist kodiert, bevor die
+    nächste gerendert wird, der Speicher ist also durch das Cache-Budget plus
+    eine Seite begrenzt. `page_qualities` überschreibt `quality` je Seite des
+    Bereichs (adaptive Qualität). `stats` erhält Seiten, Stream-Bytes und die
+    Anzahl der Seiten je Pfad.
+    """
+    output_pdf_path = range_output_path(pdf_path, temp_dir, first_page, last_page)
+    writer = PdfWriter()
+    paths = Counter()
+    pages = stream_bytes = 0
     try:
-        images = convert_from_path(pdf_path, dpi=dpi)
+        reader = PdfReader(pdf_path) if PAGE_ANALYSIS else None
+        if last_page is None:
+            last_page = count_pages(pdf_path) - 1
+        reencoded = set()
+        for offset, page_number in enumerate(range(first_page or 0, last_page + 1)):
+            page_quality = page_qualities[offset] if page_qualities else quality
+            kind, size = encode_page(writer, pdf_path, page_number, page_quality, dpi, reader, reencoded)
+            paths[kind] += 1
+            stream_bytes += size
+            pages += 1
     except Exception as e:
         print(f"❌ Fehler beim Rendern von {pdf_path}: {e}")
         return None
 
-    writer = PdfWriter()
-    for i, img in enumerate(images):
-        jpg_path = temp_dir / f"{Path(pdf_path).stem}_p{i}_{dpi}dpi.jpg"
-        img.save(jpg_path, "JPEG", quality=quality)
-        pdf_page_path = temp_dir / f"{Path(pdf_path).stem}_p{i}.pdf"
-        Image.open(jpg_path).save(pdf_page_path, "PDF")
-        writer.append(str(pdf_page_path))
+    writer.write(output_pdf_path)
+    if stats is not None:
+        stats.update(pages=pages, stream_bytes=stream_bytes, paths=paths)
+    return str(output_pdf_path)
+
+# === GHOSTSCRIPT-ENGINE ===
+def quality_to_qfactor(quality):
+    """JPEG-Qualität (IJG, 1–100) → Ghostscript-QFactor; QFactor 1.0 entspricht den Standardtabellen (≈ 50)."""
+    scale = 50 / quality if quality < 50 else (200 - 2 * quality) / 100
+    return round(max(scale, 0.01), 3)
+
+def ghostscript_command(pdf_path, output_path, quality, dpi, first_page=None, last_page=None):
+    qfactor = quality_to_qfactor(quality)
+    image_dict = f"<< /QFactor {qfactor} /Blend 1 /HSamples [2 1 1 2] /VSamples [2 1 1 2] >>"
+    command = [
+        GHOSTSCRIPT, "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.5",
+        "-dNOPAUSE", "-dBATCH", "-dQUIET", "-dSAFER",
+        "-dDetectDuplicateImages=true", "-dCompressFonts=true", "-dSubsetFonts=true",
+        f"-sOutputFile={output_path}",
+    ]
+    for kind in ("Color", "Gray"):
+        command += [
+            f"-dDownsample{kind}Images=true", f"-d{kind}ImageDownsampleType=/Bicubic",
+            f"-d{kind}ImageResolution={dpi}", f"-d{kind}ImageDownsampleThreshold=1.0",
+            f"-dAutoFilter{kind}Images=false", f"-d{kind}ImageFilter=/DCTEncode",
+        ]
+    # Strichgrafik verträgt kein JPEG: nur herunterrechnen, CCITT/Flate bleibt
+    command += ["-dDownsampleMonoImages=true", f"-dMonoImageResolution={dpi * 2}"]
+    if first_page is not None:
+        command += [f"-dFirstPage={first_page + 1}", f"-dLastPage={last_page + 1}"]
+    command += ["-c", f"<< /ColorImageDict {image_dict} /GrayImageDict {image_dict} >> setdistillerparams",
+                "-f", str(pdf_path)]
+    return command
+
+@timed()
+def compress_ghostscript(pdf_path, quality, dpi, temp_dir, first_page=None, last_page=None, stats=None,
+                         page_qualities=None):
+    """Ghostscript-Engine: pdfwrite rechnet Bilder auf `dpi` herunter und kodiert sie mit `quality` neu.
+
+    Text und Vektorgrafik bleiben erhalten. Ein gs-Prozess je Datei (siehe
+    WHOLE_FILE_ENGINES), die Dateien laufen parallel auf den Workern: getrennte
+    Seitenbereiche würden jede Schriftuntermenge mehrfach einbetten.
+    """
+    output_pdf_path = range_output_path(pdf_path, temp_dir, first_page, last_page)
+    if last_page is None:
+        first_page, last_page = None, None
+    try:
+        subprocess.run(ghostscript_command(pdf_path, output_pdf_path, quality, dpi, first_page, last_page),
+                       check=True, capture_output=True, timeout=GHOSTSCRIPT_TIMEOUT)
+        COUNTERS["ghostscript_runs"] += 1
+        pages = count_pages(str(output_pdf_path))
+    except (OSError, subprocess.SubprocessError) as e:
+        detail = getattr(e, "stderr", None)
+        detail = detail.decode(errors="replace").strip() if detail else e
+        print(f"❌ Ghostscript-Fehler bei {pdf_path}: {detail}")
+        return None
+
+    if stats is not None:
+        # Für die Größenschätzung: Dateigröße ohne den Anteil, den das Bündel je Seite neu schreibt
+        size = get_file_size(output_pdf_path)
+        stats.update(pages=pages, stream_bytes=max(0, size - pages * PAGE_OVERHEAD_BYTES - PDF_OVERHEAD_BYTES),
+                     paths=Counter(ghostscript=pages))
+    return str(output_pdf_path)
+
+ENGINES = {"raster": compress_raster, "ghostscript": compress_ghostscript}
+ENGINE_LABELS = {"raster": "Raster", "ghostscript": "Ghostscript"}
+# Engines, deren Ausgabe nicht in Seitenbereiche zerlegt werden darf (eigene Schriftuntermengen je Lauf)
+WHOLE_FILE_ENGINES = {"ghostscript"}
+_ghostscript_warned = False
+
+def available_engines(engines=None):
+    """Engines aus `engines` (Standard: ENGINE_ORDER), die hier lauffähig sind."""
+    global _ghostscript_warned
+    names = [name for name in (engines or ENGINE_ORDER) if name in ENGINES]
+    if "ghostscript" in names and not GHOSTSCRIPT:
+        if not _ghostscript_warned:
+            print("⚠️ Ghostscript nicht gefunden – nur Raster-Engine")
+            _ghostscript_warned = True
+        names.remove("ghostscript")
+    return names
+
+# === MESSUNG ===
+def configure_metrics():
+    metrics.configure(tracing=TRACE_FILE is not None, profiling=PROFILE_FILE is not None)
+
+def write_metrics():
+    """Gibt die Stufenzeiten aus und schreibt Trace/Profil, falls konfiguriert."""
+    metrics.print_summary()
+    if TRACE_FILE is not None:
+        metrics.write_trace(TRACE_FILE)
+    if PROFILE_FILE is not None:
+        metrics.write_profile(PROFILE_FILE)
+
+# === PERSISTENTER WORKER-POOL ===
+_pool = None
+# Batch-Threads und der Tk-Abbruch greifen gleichzeitig auf den Pool zu
+_pool_lock = threading.RLock()
+POOL_METRICS = {"workers": 0, "startup_seconds": None, "starts": 0}
+
+def _init_worker(ready, settings, workers):
+    # Beim Spawn ist dieses Modul samt pypdf, pdf2image und PIL bereits importiert;
+    # im Elternprozess geänderte Parameter werden hier nachgezogen
+    global RASTER_CACHE
+    globals().update(settings)
+    configure_metrics()
+    # Jeder Worker hat seinen eigenen RAM-Cache: das Budget gilt für den ganzen Pool
+    RASTER_CACHE = RasterCache(
+        RASTER_CACHE_MEMORY_MB * 1024 * 1024 // workers,
+        RASTER_CACHE_DIR,
+        RASTER_CACHE_DISK_MB * 1024 * 1024,
+    )
+    with ready.get_lock():
+        ready.value += 1
+
+@timed()
+def get_pool():
+    """Einmal gestarteter spawn-Pool, geteilt von CLI-Suche, Gruppenpfad und Tk-Reiter.
+
+    Wartet beim ersten Aufruf, bis alle Worker ihre Importe erledigt haben,
+    und hält die Startkosten in POOL_METRICS fest. Ein Abbruch während des
+    Starts beendet den halb gestarteten Pool und wirft CompressionCancelled.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            check_cancelled()
+            configure_metrics()
+            ctx = get_context("spawn")
+            workers = POOL_WORKERS or cpu_count()
+            ready = ctx.Value("i", 0)
+            start = time.perf_counter()
+            _pool = ctx.Pool(workers, initializer=_init_worker,
+                             initargs=(ready, {name: globals()[name] for name in WORKER_SETTINGS}, workers))
+            deadline = start + 120
+            while ready.value < workers and time.perf_counter() < deadline:
+                if CANCEL_EVENT.is_set():
+                    _shutdown_locked(terminate=True)
+                    raise CompressionCancelled()
+                time.sleep(0.01)
+            POOL_METRICS.update(
+                workers=workers,
+                startup_seconds=time.perf_counter() - start,
+                starts=POOL_METRICS["starts"] + 1,
+            )
+        return _pool
+
+def shutdown_pool(terminate=False):
+    """Beendet den Pool; `terminate=True` bricht laufende Aufgaben sofort ab."""
+    with _pool_lock:
+        _shutdown_locked(terminate)
+
+def _shutdown_locked(terminate):
+    global _pool
+    if _pool is None:
+        return
+    if terminate:
+        _pool.terminate()
+    else:
+        _pool.close()
+    _pool.join()
+    _pool = None
+
+atexit.register(shutdown_pool)
+
+# === ABBRUCH ===
+CANCEL_EVENT = threading.Event()
+
+class CompressionCancelled(Exception):
+    """Der Lauf wurde über cancel_compression() abgebrochen."""
+
+def cancel_compression():
+    """Bricht einen laufenden Lauf ab (z. B. aus dem Tk-Thread) und beendet die Worker sofort.
+
+    Startet der Pool gerade, wartet der Aufruf höchstens bis zur nächsten
+    Prüfung in get_pool, das den Pool dann selbst beendet.
+    """
+    CANCEL_EVENT.set()
+    shutdown_pool(terminate=True)
+
+def check_cancelled():
+    if CANCEL_EVENT.is_set():
+        raise CompressionCancelled()
+
+def iterate_pool(pool, func, tasks):
+    """imap_unordered mit Abbruchprüfung: ein terminierter Pool weckt wartende Iteratoren nicht mehr."""
+    if not tasks:
+        return
+    iterator = pool.imap_unordered(func, tasks)
+    for _ in tasks:
+        while True:
+            check_cancelled()
+            try:
+                result = iterator.next(timeout=0.2)
+                break
+            except multiprocessing.TimeoutError:
+                continue
+        yield result
 
+def print_pool_metrics():
+    if POOL_METRICS["startup_seconds"] is not None:
+        print(f"🏊 Pool: {POOL_METRICS['workers']} Worker, Start {POOL_METRICS['startup_seconds']:.2f} s "
+              f"({POOL_METRICS['starts']}× gestartet)")
+
+# === SEITENBASIERTE ARBEITSVERTEILUNG ===
+@timed()
+def plan_work_units(pdfs, workers, split=True):
+    """Zerlegt die Dokumente in Seitenbereiche `(index, pdf, erste, letzte)`.
+
+    Die Bereichsgröße richtet sich nach der Gesamtseitenzahl, sodass ein
+    großes Dokument auf mehrere Worker verteilt wird; mit `split=False` ist
+    jede Datei genau eine Einheit. Sortiert größte zuerst (LPT), damit
+    imap_unordered die Last gleichmäßig verteilt.
+    """
+    page_counts = []
+    for pdf in pdfs:
+        try:
+            page_counts.append(count_pages(pdf))
+        except Exception as e:
+            print(f"❌ Fehler beim Lesen von {pdf}: {e}")
+            page_counts.append(0)
+
+    unit_pages = max(MIN_UNIT_PAGES, math.ceil(sum(page_counts) / (workers * UNITS_PER_WORKER)))
+    units = []
+    for index, (pdf, pages) in enumerate(zip(pdfs, page_counts)):
+        if not pages:
+            continue
+        parts = math.ceil(pages / unit_pages) if split else 1
+        bounds = [round(i * pages / parts) for i in range(parts + 1)]
+        for first, end in zip(bounds, bounds[1:]):
+            units.append((index, pdf, first, end - 1))
+    units.sort(key=lambda unit: unit[3] - unit[2], reverse=True)
+    return units
+
+def compress_unit(args):
+    """Pool-Aufgabe für einen Seitenbereich; meldet Seiten, Stream-Bytes, PID und Spitzen-RSS."""
+    global _task_render_dpi
+    index, pdf, first_page, last_page, quality, dpi, temp_dir, page_qualities, engine, _task_render_dpi = args
+    stats = {"pages": 0, "stream_bytes": 0, "paths": Counter()}
+    with metrics.profiled(), metrics.stage("compress_unit"):
+        path = compress_pdf_with_quality_and_dpi(pdf, quality, dpi, temp_dir, first_page, last_page, stats,
+                                                 page_qualities, engine)
+    stats.update(index=index, first_page=first_page, path=path, pid=os.getpid(), peak_rss_mb=peak_rss_mb(),
+                 metrics=metrics.take())
+    return stats
+
+@timed()
+def assemble_document(pdf, part_paths, temp_dir):
+    """Fügt die Teilbereiche eines Dokuments in Seitenreihenfolge zusammen.
+
+    Jeder Teil bringt seine eigene Kopie geteilter Ressourcen (Schriften,
+    Bilder übernommener Seiten) mit; identische Objekte werden daher vor dem
+    Schreiben zusammengelegt.
+    """
+    output_pdf_path = temp_dir / f"compressed_{Path(pdf).name}"
+    if len(part_paths) == 1:
+        os.replace(part_paths[0], output_pdf_path)
+        return str(output_pdf_path)
+    writer = PdfWriter()
+    for part in part_paths:
+        writer.append(part)
+    writer.compress_identical_objects()
     writer.write(output_pdf_path)
+    for part in part_paths:
+        os.remove(part)
     return str(output_pdf_path)
 
+# === ERGEBNIS-CACHE ÜBER LÄUFE HINWEG ===
+def result_cache_key(pdf, quality, dpi, page_qualities=None, engine="raster", render_dpi=None):
+    parts = [file_hash(pdf), str(dpi), str(quality), f"a{int(PAGE_ANALYSIS)}b{PAGE_BUDGET_BYTES}"]
+    if engine != "raster" and not page_qualities:
+        parts.append(engine)
+    elif EXACT_RASTER:
+        parts.append("exact")
+    else:
+        # Gerastert wird mit der Render-Auflösung und dem Filter, die auch der Worker verwendet
+        render_dpi = max(dpi, render_dpi or RENDER_DPI or dpi)
+        parts.append(f"r{render_dpi}{DOWNSAMPLE_FILTER.lower()}{DOWNSAMPLE_REDUCING_GAP:g}")
+    if page_qualities:
+        parts.append(hashlib.sha1(",".join(map(str, page_qualities)).encode()).hexdigest()[:12])
+    return "_".join(parts)
+
+@timed()
+def load_cached_result(pdf, key, temp_dir):
+    """Kopiert ein zwischengespeichertes Ergebnis nach `temp_dir` (None bei Fehlschlag)."""
+    if not RESULT_CACHE_MB:
+        return None
+    cached_pdf = RESULT_CACHE_DIR / f"{key}.pdf"
+    try:
+        with open(RESULT_CACHE_DIR / f"{key}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        output_pdf_path = temp_dir / f"compressed_{Path(pdf).name}"
+        shutil.copyfile(cached_pdf, output_pdf_path)
+        os.utime(cached_pdf)
+    except (OSError, ValueError):
+        return None
+    return {
+        "pdf": pdf,
+        "path": str(output_pdf_path),
+        "pages": meta["pages"],
+        "stream_bytes": meta["stream_bytes"],
+        "paths": Counter(meta["paths"]),
+    }
+
+def _atomic_write(path, write):
+    """Schreibt über eine eindeutige Temp-Datei im Zielordner; parallele Batch-Threads kollidieren nicht."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        write(f)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+@timed()
+def store_cached_result(key, result):
+    if not RESULT_CACHE_MB:
+        return
+    RESULT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(result["path"], "rb") as source:
+        _atomic_write(RESULT_CACHE_DIR / f"{key}.pdf", lambda f: shutil.copyfileobj(source, f))
+    # Die JSON-Datei zuletzt: ihr Vorhandensein markiert einen vollständigen Eintrag
+    meta = {"pages": result["pages"], "stream_bytes": result["stream_bytes"], "paths": dict(result["paths"])}
+    _atomic_write(RESULT_CACHE_DIR / f"{key}.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+    evict_result_cache()
+
+@timed()
+def evict_result_cache():
+    """LRU nach mtime, bis der Cache unter RESULT_CACHE_MB liegt."""
+    entries = []
+    for path in RESULT_CACHE_DIR.glob("*.pdf"):
+        try:
+            entries.append((path.stat(), path))
+        except FileNotFoundError:
+            pass
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, path in sorted(entries, key=lambda e: e[0].st_mtime_ns):
+        if total <= RESULT_CACHE_MB * 1024 * 1024:
+            break
+        path.with_suffix(".json").unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+        total -= stat.st_size
+
+@timed()
+def compress_documents(pdfs, quality, dpi, temp_dir, pool=None, worker_peaks=None, page_qualities=None,
+                       progress=None, engine="raster", render_dpi=None):
+    """Komprimiert alle Dokumente seitenbereichsweise parallel.
+
+    Rückgabe: je Dokument in der Reihenfolge von `pdfs` ein Dict mit `pdf`,
+    `path`, `pages` und `stream_bytes` (None bei Fehlern).
+    `worker_peaks` (PID → MB) wird mit dem Spitzen-RSS der Worker ergänzt.
+    `page_qualities` enthält optional je Dokument eine Qualität pro Seite.
+    Unveränderte Dateien kommen aus dem Ergebnis-Cache und werden nicht neu gerechnet.
+    `progress(erledigte_seiten, seiten_gesamt)` wird nach jedem Seitenbereich aufgerufen.
+    `engine` wählt die Kompressions-Engine (siehe ENGINES), `render_dpi` die
+    Auflösung, aus der kleinere DPI abgeleitet werden (siehe render_dpi_for).
+    """
+    check_cancelled()
+    keys = [result_cache_key(pdf, quality, dpi, page_qualities[index] if page_qualities else None, engine,
+                             render_dpi)
+            for index, pdf in enumerate(pdfs)]
+    cached = {}
+    for index, pdf in enumerate(pdfs):
+        result = load_cached_result(pdf, keys[index], temp_dir)
+        if result:
+            cached[index] = result
+    if cached:
+        print(f"♻️ {len(cached)} von {len(pdfs)} Dateien aus dem Cache")
+
+    pending = [index for index in range(len(pdfs)) if index not in cached]
+    if pool is None and pending:
+        pool = get_pool()
+    # Absolute Pfade: die Worker hängen nicht vom Arbeitsverzeichnis des Aufrufers ab
+    tasks = [(pending[index], os.path.abspath(pdf), first, last, quality, dpi, Path(temp_dir).resolve(),
+              page_qualities[pending[index]][first:last + 1] if page_qualities else None, engine, render_dpi)
+             for index, pdf, first, last in plan_work_units([pdfs[i] for i in pending],
+                                                            POOL_METRICS["workers"] or cpu_count(),
+                                                            split=engine not in WHOLE_FILE_ENGINES)]
+    parts = defaultdict(list)
+    failed = set()
+    pages_total = sum(task[3] - task[2] + 1 for task in tasks)
+    pages_done = 0
+
+    for unit in iterate_pool(pool, compress_unit, tasks):
+        metrics.merge(unit["metrics"])
+        pages_done += unit["pages"]
+        if progress:
+            progress(pages_done, pages_total)
+        if unit["path"] is None:
+            failed.add(unit["index"])
+        else:
+            parts[unit["index"]].append(unit)
+        if worker_peaks is not None and unit["peak_rss_mb"] is not None:
+            worker_peaks[unit["pid"]] = max(worker_peaks.get(unit["pid"], 0), unit["peak_rss_mb"])
+
+    results = []
+    for index, pdf in enumerate(pdfs):
+        if index in cached:
+            results.append(cached[index])
+            continue
+        if index in failed or index not in parts:
+            results.append(None)
+            continue
+        units = sorted(parts[index], key=lambda unit: unit["first_page"])
+        result = {
+            "pdf": pdf,
+            "path": assemble_document(pdf, [unit["path"] for unit in units], temp_dir),
+            "pages": sum(unit["pages"] for unit in units),
+            "stream_bytes": sum(unit["stream_bytes"] for unit in units),
+            "paths": sum((unit["paths"] for unit in units), Counter()),
+        }
+        store_cached_result(keys[index], result)
+        results.append(result)
+    return results
+
+PATH_LABELS = {"passthrough": "übernommen", "reencode": "Bilder neu kodiert", "raster": "gerastert",
+               "ghostscript": "per Ghostscript"}
+
+def print_page_paths(results, prefix=""):
+    paths = sum((r["paths"] for r in results if r), Counter())
+    summary = ", ".join(f"{paths[kind]} {label}" for kind, label in PATH_LABELS.items()
+                        if paths[kind] or kind != "ghostscript")
+    print(f"{prefix}🔍 Seiten: {summary}")
+
+# === GRÖSSENSCHÄTZUNG OHNE MERGE ===
+@timed()
+def estimate_bundle_size(results):
+    """Geschätzte Größe des gemergten PDFs aus den JPEG-Stream-Größen der Dokumente.
+
+    Fehlt ein Dokument (Engine gescheitert), passt die Kombination nicht: `math.inf`.
+    """
+    if not all(results):
+        return math.inf
+    pages = sum(r["pages"] for r in results)
+    stream_bytes = sum(r["stream_bytes"] for r in results)
+    return stream_bytes + pages * PAGE_OVERHEAD_BYTES + PDF_OVERHEAD_BYTES
+
 # === 3. Gesamtgröße in Byte ===
 def get_file_size(path):
     return os.path.getsize(path)
 
 # === 4. PDF zusammenfügen ===
-def merge_pdfs(pdf_paths, output_path):
-    merger = PdfMerger()
+@timed()
+def merge_pdfs(pdf_paths, output_path, structure=None, pdfs=None, page_counts=None):
+    """Fügt die PDFs zusammen; mit `structure` werden die Lesezeichen im selben Schreibvorgang angelegt.
+
+    `page_counts` sind die Seitenzahlen je Datei in `pdfs` (aus der Kompression);
+    fehlen sie, werden sie über count_pages ermittelt.
+    """
+    writer = PdfWriter()
     for path in pdf_paths:
         if path and Path(path).exists():
-            merger.append(path)
-    merger.write(output_path)
-    merger.close()
+            writer.append(path)
+    if structure:
+        add_outline_items(writer, structure, pdfs, page_counts)
+    writer.write(output_path)
+
+def result_page_counts(results):
+    return [r["pages"] if r else 0 for r in results]
 
 # === INHALTSVERZEICHNIS ALS STRUKTUR ===
-def parse_bookmark_structure(md_file="Inhaltsverzeichnis.md"):
+@timed()
+def parse_bookmark_structure(md_file=None):
+    md_file = md_file or SCRIPT_DIR / "Inhaltsverzeichnis.md"
     structure = []
     with open(md_file, "r", encoding="utf-8") as f:
         current_section = None
@@ -76,18 +1048,17 @@ def parse_bookmark_structure(md_file="Inhaltsverzeichnis.md"):
     return structure
 
 # === 5. Lesezeichenstruktur hinzufügen ===
-def add_outline(output_pdf, structure, pdfs):
-    reader = PdfReader(output_pdf)
-    writer = PdfWriter()
-
-    for page in reader.pages:
-        writer.add_page(page)
+@timed()
+def add_outline_items(writer, structure, pdfs, page_counts=None):
+    """Legt die Lesezeichen an – O(Einträge), ohne eine Seite anzufassen."""
+    if page_counts is None:
+        page_counts = [count_pages(f) for f in pdfs]
 
     page_lookup = {}
     current_page = 0
-    for f in pdfs:
+    for f, count in zip(pdfs, page_counts):
         page_lookup[f] = current_page
-        current_page += len(PdfReader(f).pages)
+        current_page += count
 
     flat_titles = [title for _, entries in structure for title in entries]
     file_map = {title: pdfs[i] for i, title in enumerate(flat_titles) if i < len(pdfs)}
@@ -100,10 +1071,19 @@ def add_outline(output_pdf, structure, pdfs):
                 page_num = page_lookup[filename]
                 writer.add_outline_item(title, page_number=page_num, parent=parent)
 
+@timed()
+def add_outline(output_pdf, structure, pdfs, page_counts=None):
+    """Lesezeichen nachträglich in ein fertiges PDF schreiben (liest und schreibt es komplett neu).
+
+    Die Pipeline legt Lesezeichen direkt in merge_pdfs an; das hier ist nur für fertige Dateien.
+    """
+    writer = PdfWriter(clone_from=output_pdf)
+    add_outline_items(writer, structure, pdfs, page_counts)
     with open(output_pdf, "wb") as f_out:
         writer.write(f_out)
 
 # === Gruppierung anhand des Inhaltsverzeichnisses ===
+@timed()
 def group_pdfs_by_structure(pdfs, structure):
     groups = defaultdict(list)
     flat_titles = [title for _, titles in structure for title in titles]
@@ -116,120 +1096,411 @@ def group_pdfs_by_structure(pdfs, structure):
     used = [pdf for group in groups.values() for pdf in group]
     unused = set(pdfs) - set(used)
     if unused:
-        print("⚠️ Nicht zugeordnete PDFs (Positionsabgleich fehlgeschlagen):", ", ".join(unused))
+        print("⚠️ Nicht zugeordnete PDFs (Positionsabgleich fehlgeschlagen):", ", ".join(sorted(Path(pdf).name for pdf in unused)))
 
     return groups
 
+# === SUCHE ÜBER DAS DPI × QUALITÄT-RASTER ===
+def _last_fitting(count, fits):
+    """Bisektion: letzter Index in `0..count-1`, für den `fits` gilt (fits(0) ist bereits wahr)."""
+    lo, hi = 0, count
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def search_pass_bound(dpi_values=DPI_VALUES, quality_values=QUALITY_VALUES):
+    """Höchstzahl der Auswertungen von find_best_combination (ohne Nachsuche nach der Prüfung)."""
+    return 1 + math.ceil(math.log2(len(dpi_values))) + math.ceil(math.log2(len(quality_values)))
+
+@timed()
+def find_best_combination(evaluate, dpi_values=DPI_VALUES, quality_values=QUALITY_VALUES, max_size=MAX_SIZE_BYTES):
+    """Treppensuche über das DPI × Qualität-Raster.
+
+    Angenommen wird nur, dass die Größe bei fester DPI mit der Qualität und bei
+    fester Qualität mit der DPI wächst. Die Sweep-Liste (DPI außen) ist damit
+    nicht sortiert – (100, 85) kann größer sein als (150, 50) – und wird nicht
+    bisektiert. Gewählt wird die höchste DPI, bei der die niedrigste Qualität
+    passt, und bei ihr die höchste passende Qualität; jede Achse wird einzeln
+    bisektiert. `evaluate(dpi, quality)` liefert `(size, payload)`.
+    Rückgabe: `((dpi, quality, size, payload) | None, stats)`.
+    """
+    results = {}
+
+    def fits(dpi, quality):
+        if (dpi, quality) not in results:
+            results[(dpi, quality)] = evaluate(dpi, quality)
+        return results[(dpi, quality)][0] <= max_size
+
+    best = None
+    if fits(dpi_values[0], quality_values[0]):
+        dpi = dpi_values[_last_fitting(len(dpi_values), lambda i: fits(dpi_values[i], quality_values[0]))]
+        quality = quality_values[_last_fitting(len(quality_values), lambda j: fits(dpi, quality_values[j]))]
+        best = (dpi, quality)
+
+    # Vergleich: ein Sweep in DPI-außen-Reihenfolge bis zur gewählten Kombination plus der nächsten
+    combos = list(product(dpi_values, quality_values))
+    linear_passes = 1 if best is None else min(len(combos), combos.index(best) + 2)
+    stats = {
+        "passes": len(results),
+        "linear_passes": linear_passes,
+        "saved": max(0, linear_passes - len(results)),
+    }
+    if best is None:
+        return None, stats
+    size, payload = results[best]
+    return (*best, size, payload), stats
+
+@timed()
+def find_verified_combination(evaluate, verify, max_size=MAX_SIZE_BYTES, dpi_values=DPI_VALUES,
+                              quality_values=QUALITY_VALUES):
+    """find_best_combination auf geschätzten Größen; nur der Kandidat wird echt gemergt.
+
+    `verify(payload)` schreibt den Kandidaten und liefert seine echte Größe.
+    Liegt sie trotz Schätzung über `max_size`, wird unterhalb der Schätzung
+    weitergesucht; bereits ausgewertete Kombinationen werden wiederverwendet.
+    """
+    evaluated = {}
+
+    def cached(dpi, quality):
+        if (dpi, quality) not in evaluated:
+            evaluated[(dpi, quality)] = evaluate(dpi, quality)
+        return evaluated[(dpi, quality)]
+
+    limit = max_size
+    linear_passes = None
+    while True:
+        best, stats = find_best_combination(cached, dpi_values, quality_values, max_size=limit)
+        # Vergleichsbasis bleibt der Sweep gegen die echte Grenze, nicht gegen die abgesenkte
+        if linear_passes is None:
+            linear_passes = stats["linear_passes"]
+        stats.update(passes=len(evaluated), linear_passes=linear_passes,
+                     saved=max(0, linear_passes - len(evaluated)))
+        if best is None:
+            return None, stats
+        dpi, quality, estimate, payload = best
+        size = verify(payload)
+        if size <= max_size:
+            return (dpi, quality, size, payload), stats
+        print(f"↩️ {quality} @ {dpi} DPI: geschätzt {estimate/1024/1024:.2f} MB, "
+              f"tatsächlich {size/1024/1024:.2f} MB – suche darunter weiter")
+        limit = estimate - 1
+
+@timed()
+def find_engine_combination(evaluate, verify, max_size=MAX_SIZE_BYTES, dpi_values=DPI_VALUES,
+                            quality_values=QUALITY_VALUES, engines=None, prefix=""):
+    """Sucht Engine für Engine (günstigste zuerst) und hört bei der ersten passenden auf.
+
+    `evaluate(engine, dpi, quality)` wie bei find_best_combination.
+    Rückgabe: `(engine, (dpi, quality, size, payload))` oder `(None, None)`.
+    """
+    for engine in available_engines(engines):
+        print(f"{prefix}🧰 Engine: {ENGINE_LABELS[engine]}")
+        best, stats = find_verified_combination(lambda dpi, quality: evaluate(engine, dpi, quality), verify,
+                                                max_size, dpi_values, quality_values)
+        print_search_stats(stats, prefix)
+        if best:
+            return engine, best
+        print(f"{prefix}↪️ {ENGINE_LABELS[engine]} schafft {max_size/1024/1024:.2f} MB nicht – nächste Engine")
+    return None, None
+
+def print_search_stats(stats, prefix=""):
+    print(f"{prefix}🔎 {stats['passes']} Durchläufe statt {stats['linear_passes']} "
+          f"({stats['saved']} Kodier-Durchläufe eingespart)")
+
+# === ADAPTIVE QUALITÄT JE SEITE ===
+def measure_unit(args):
+    """Pool-Aufgabe: Stream-Größe je Seite und Qualität, ohne etwas zu schreiben."""
+    global _task_render_dpi
+    index, pdf, first_page, last_page, dpi, qualities, _task_render_dpi = args
+    curves = []
+    with metrics.profiled(), metrics.stage("measure_unit"):
+        reader = PdfReader(pdf) if PAGE_ANALYSIS else None
+        for page_number in range(first_page, last_page + 1):
+            curve = {}
+            for quality in qualities:
+                # Wegwerf-Writer: gemessen wird derselbe Pfad (Übernahme/Bilder/Raster) wie beim Schreiben
+                _, curve[quality] = encode_page(PdfWriter(), pdf, page_number, quality, dpi, reader)
+            curves.append(curve)
+    return index, first_page, curves, metrics.take()
+
+@timed()
+def measure_page_curves(pdfs, dpi, qualities, pool=None, render_dpi=None):
+    """Größe-über-Qualität-Kurven aller Seiten als flache Liste in Bundle-Reihenfolge."""
+    check_cancelled()
+    if pool is None:
+        pool = get_pool()
+    tasks = [(index, os.path.abspath(pdf), first, last, dpi, qualities, render_dpi)
+             for index, pdf, first, last in plan_work_units(pdfs, POOL_METRICS["workers"] or cpu_count())]
+    measured = sorted(iterate_pool(pool, measure_unit, tasks), key=lambda m: (m[0], m[1]))
+    for *_, snapshot in measured:
+        metrics.merge(snapshot)
+    return [curve for _, _, curves, _ in measured for curve in curves]
+
+def interpolate_curve(measured, qualities=QUALITY_VALUES):
+    """Ergänzt nicht gemessene Qualitätsstufen linear und erzwingt Monotonie."""
+    points = sorted(measured.items())
+    curve = {}
+    previous = 0
+    for quality in qualities:
+        if quality in measured:
+            size = measured[quality]
+        else:
+            lower = max((p for p in points if p[0] < quality), default=points[0])
+            upper = min((p for p in points if p[0] > quality), default=points[-1])
+            if upper[0] == lower[0]:
+                size = lower[1]
+            else:
+                size = lower[1] + (upper[1] - lower[1]) * (quality - lower[0]) / (upper[0] - lower[0])
+        previous = curve[quality] = max(int(size), previous)
+    return curve
+
+@timed()
+def allocate_page_qualities(curves, budget, qualities=QUALITY_VALUES):
+    """Greedy-Ratenverteilung von `budget` Byte auf die Seiten.
+
+    Startet alle Seiten mit der niedrigsten Qualität und hebt jeweils die Seite
+    an, deren nächste Stufe die wenigsten zusätzlichen Byte kostet – Textseiten
+    steigen so früh auf, Fotoseiten erst, wenn das Budget es hergibt.
+    Rückgabe: `(qualitäten, bytes)` oder None, wenn schon die Mindeststufe zu groß ist.
+    """
+    levels = [0] * len(curves)
+    spent = sum(curve[qualities[0]] for curve in curves)
+    if spent > budget:
+        return None
+
+    heap = []
+
+    def push(page):
+        level = levels[page]
+        if level + 1 < len(qualities):
+            cost = curves[page][qualities[level + 1]] - curves[page][qualities[level]]
+            heapq.heappush(heap, (cost, page))
+
+    for page in range(len(curves)):
+        push(page)
+    while heap:
+        cost, page = heapq.heappop(heap)
+        if spent + cost > budget:
+            break
+        spent += cost
+        levels[page] += 1
+        push(page)
+    return [qualities[level] for level in levels], spent
+
+@timed()
+def compress_adaptive(pdfs, temp_dir, merged_path, max_size=MAX_SIZE_BYTES, worker_peaks=None, structure=None,
+                      dpi_values=DPI_VALUES, quality_values=QUALITY_VALUES):
+    """Höchste DPI, bei der alle Seiten mit Mindestqualität passen; Qualität je Seite verteilt.
+
+    Je verworfener DPI wird nur einmal pro Seite kodiert, für die gewählte DPI
+    an CURVE_QUALITIES (innerhalb von `quality_values`, dazu deren Höchstwert)
+    und zum Schluss einmal mit der zugeteilten Qualität.
+    Rückgabe: `(dpi, size, results)` oder None.
+    """
+    page_counts = [count_pages(pdf) for pdf in pdfs]
+    overhead = sum(page_counts) * PAGE_OVERHEAD_BYTES + PDF_OVERHEAD_BYTES
+    encodes = 0
+    render_dpi = render_dpi_for(dpi_values)
+    lowest = quality_values[0]
+    highest = quality_values[-1]
+    curve_qualities = [q for q in sorted({*CURVE_QUALITIES, highest}) if lowest < q <= highest]
+
+    for dpi in sorted(dpi_values, reverse=True):
+        minimum = measure_page_curves(pdfs, dpi, [lowest], render_dpi=render_dpi)
+        encodes += len(minimum)
+        if sum(curve[lowest] for curve in minimum) + overhead > max_size:
+            print(f"🎯 {dpi} DPI: schon Mindestqualität zu groß")
+            continue
+
+        measured = measure_page_curves(pdfs, dpi, curve_qualities, render_dpi=render_dpi)
+        encodes += sum(len(curve) for curve in measured)
+        curves = [interpolate_curve({**low, **rest}, quality_values) for low, rest in zip(minimum, measured)]
+
+        budget = max_size - overhead
+        local_temp = temp_dir / f"adaptive_{dpi}"
+        local_temp.mkdir(parents=True, exist_ok=True)
+        while True:
+            allocation = allocate_page_qualities(curves, budget, quality_values)
+            if allocation is None:
+                break
+            qualities, spent = allocation
+            per_document, offset = [], 0
+            for count in page_counts:
+                per_document.append(qualities[offset:offset + count])
+                offset += count
+            results = compress_documents(pdfs, None, dpi, local_temp, worker_peaks=worker_peaks,
+                                         page_qualities=per_document, render_dpi=render_dpi)
+            encodes += len(qualities)
+            merge_pdfs([r["path"] for r in results if r], merged_path, structure, pdfs, result_page_counts(results))
+            size = get_file_size(merged_path)
+            if size <= max_size:
+                print(f"🎯 Adaptive Qualität @ {dpi} DPI: Ø {sum(qualities) / len(qualities):.0f} "
+                      f"(min {min(qualities)}, max {max(qualities)}), {size/1024/1024:.2f} MB, "
+                      f"{encodes} Kodierungen (globale Treppensuche: bis zu "
+                      f"{search_pass_bound(dpi_values, quality_values) * len(qualities)})")
+                return dpi, size, results
+            # Kurven waren interpoliert: Überschuss abziehen und neu verteilen
+            budget = spent - (size - max_size) - 1
+    return None
+
 # === Gruppenkompression effizient und strukturiert ===
-def compress_group(pdf_list, title, structure):
+def group_file_suffix(title):
+    return title.replace(":", "").replace("/", "-").replace(" ", "_")
+
+@timed()
+def compress_group(pdf_list, title, structure, max_size=MAX_SIZE_BYTES, dpi_values=DPI_VALUES,
+                   quality_values=QUALITY_VALUES, progress=None, tmp_dir=None, out_file=None):
+    """Sucht für eine Gruppe die beste Kombination; Rückgabe: Pfad der Ausgabedatei oder None.
+
+    Ohne `out_file` landet die Gruppe als `Anlagen-<Titel>.pdf` in SCRIPT_DIR.
+    """
     print(f"🗂️ Bearbeite Gruppe: '{title}'")
-    dpi_values = [100, 150, 200, 250, 300]
-    quality_values = [50, 55, 60, 65, 70, 75, 80, 85]
-
-    sanitized_title = title.replace(":", "").replace("/", "-").replace(" ", "_")
-    temp_dir = TMP_DIR / sanitized_title
-    out_file = f"Anlagen-{sanitized_title}.pdf"
-    last_valid = None
-
-    for dpi in dpi_values:
-        for quality in quality_values:
-            local_temp = temp_dir / f"{dpi}_{quality}"
-            if local_temp.exists():
-                shutil.rmtree(local_temp)
-            local_temp.mkdir(parents=True, exist_ok=True)
-
-            optimized = []
-            for pdf in pdf_list:
-                result = compress_pdf_with_quality_and_dpi(pdf, quality, dpi, local_temp)
-                if result:
-                    optimized.append(result)
-
-            merged_path = local_temp / "test.pdf"
-            merge_pdfs(optimized, merged_path)
-            size = get_file_size(merged_path)
-            size_mb = size / 1024 / 1024
-            print(f"  ⚙️ [{title}] Kombination {quality} @ {dpi} DPI ↪️ {size_mb:.2f} MB")
 
-            if size <= MAX_SIZE_BYTES:
-                last_valid = (dpi, quality, merged_path)
-            else:
-                if last_valid:
-                    dpi, quality, merged_path = last_valid
-                    print(f"  ✅ Beste Kombination für '{title}': {dpi} DPI @ Qualität {quality} ({get_file_size(merged_path)/1024/1024:.2f} MB)")
-                    shutil.copy(merged_path, out_file)
-                    add_outline(out_file, [s for s in structure if s[0] == title], pdf_list)
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    return
-                else:
-                    break
+    sanitized_title = group_file_suffix(title)
+    temp_dir = Path(tmp_dir or TMP_DIR) / sanitized_title
+    out_file = str(out_file or SCRIPT_DIR / f"Anlagen-{sanitized_title}.pdf")
 
-    if last_valid:
-        dpi, quality, merged_path = last_valid
-        print(f"  ✅ Beste Kombination für '{title}': {dpi} DPI @ Qualität {quality} ({get_file_size(merged_path)/1024/1024:.2f} MB)")
-        shutil.copy(merged_path, out_file)
-        add_outline(out_file, [s for s in structure if s[0] == title], pdf_list)
-    else:
-        print(f"  ❌ Keine gültige Kombination für '{title}'")
+    def evaluate(engine, dpi, quality):
+        local_temp = temp_dir / f"{engine}_{dpi}_{quality}"
+        if local_temp.exists():
+            shutil.rmtree(local_temp)
+        local_temp.mkdir(parents=True, exist_ok=True)
+
+        results = compress_documents(pdf_list, quality, dpi, local_temp, progress=progress, engine=engine,
+                                     render_dpi=render_dpi_for(dpi_values))
+        size = estimate_bundle_size(results)
+        if size == math.inf:
+            print(f"  ❌ [{title}] {ENGINE_LABELS[engine]} {quality} @ {dpi} DPI: "
+                  f"{results.count(None)} Datei(en) fehlgeschlagen – verworfen")
+        else:
+            print(f"  ⚙️ [{title}] {ENGINE_LABELS[engine]} {quality} @ {dpi} DPI ↪️ ~{size/1024/1024:.2f} MB")
+        return size, (local_temp, results)
+
+    def verify(payload):
+        local_temp, results = payload
+        merge_pdfs([r["path"] for r in results if r], local_temp / "test.pdf",
+                   [s for s in structure if s[0] == title], pdf_list, result_page_counts(results))
+        return get_file_size(local_temp / "test.pdf")
 
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        engine, best = find_engine_combination(evaluate, verify, max_size, dpi_values, quality_values,
+                                               prefix=f"  [{title}] ")
+
+        if best:
+            dpi, quality, size, (local_temp, results) = best
+            print(f"  ✅ Beste Kombination für '{title}': {ENGINE_LABELS[engine]}, {dpi} DPI @ Qualität {quality} "
+                  f"({size/1024/1024:.2f} MB)")
+            print_page_paths(results, prefix="  ")
+            shutil.copy(local_temp / "test.pdf", out_file)
+            return out_file
+        print(f"  ❌ Keine gültige Kombination für '{title}'")
+        return None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 # === MAIN ===
+@timed()
+def run_compression(max_size=MAX_SIZE_BYTES, dpi_values=DPI_VALUES, quality_values=QUALITY_VALUES, progress=None,
+                    source_dir=None, output_path=None, tmp_dir=None):
+    """Kompletter Lauf für einen Ordner: Suche, Lesezeichen, ggf. Gruppierung.
+
+    Geteilt von `main()`, dem Tk-Reiter und dem Batch-Lauf (compress_pdf_batch).
+    Standard: Eingabe SCRIPT_DIR, Ausgabe SEND_TO/OUTPUT_FILE, Zwischenablage
+    TMP_DIR – parallele Läufe brauchen je einen eigenen `tmp_dir`. Gruppen
+    landen als `<Ausgabe>-<Titel>.pdf` neben der Ausgabe.
+    `progress(erledigte_seiten, seiten_gesamt)` meldet den Fortschritt je
+    Suchdurchlauf. Rückgabe: Liste der erzeugten Dateien (leer, wenn nichts
+    passt). Wirft CompressionCancelled nach cancel_compression().
+    """
+    CANCEL_EVENT.clear()
+    source_dir = Path(source_dir or SCRIPT_DIR).resolve()
+    output_path = Path(output_path or SEND_TO / OUTPUT_FILE).resolve()
+    tmp_dir = Path(tmp_dir or TMP_DIR)
+
+    pdfs = get_ordered_pdfs(source_dir)
+    if not pdfs:
+        print(f"⚠️ Keine PDF-Dateien in '{source_dir}' gefunden.")
+        return []
+    toc = source_dir / "Inhaltsverzeichnis.md"
+    bookmark_structure = parse_bookmark_structure(toc) if toc.exists() else []
+
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    try:
+        return _run_search(pdfs, bookmark_structure, max_size, dpi_values, quality_values, progress,
+                           output_path, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _run_search(pdfs, bookmark_structure, max_size, dpi_values, quality_values, progress, output_path, tmp_dir):
+    worker_peaks = {}
+    merged_path = tmp_dir / "temp_merged.pdf"
+
+    def evaluate(engine, dpi, quality):
+        print(f"⚙️ Teste Qualität {quality} @ {dpi} DPI ({ENGINE_LABELS[engine]})...")
+        # Eigener Ordner je Kombination, damit die beste Kombination nicht von späteren Proben überschrieben wird
+        local_temp = tmp_dir / f"{engine}_{dpi}_{quality}"
+        local_temp.mkdir(parents=True, exist_ok=True)
+        results = compress_documents(pdfs, quality, dpi, local_temp, worker_peaks=worker_peaks, progress=progress,
+                                     engine=engine, render_dpi=render_dpi_for(dpi_values))
+        size = estimate_bundle_size(results)
+        if size == math.inf:
+            print(f"❌ {results.count(None)} Datei(en) fehlgeschlagen – Kombination verworfen")
+        else:
+            print(f"📦 Ergebnis (geschätzt): {size/1024/1024:.2f} MB")
+        return size, results
+
+    def verify(results):
+        # Lesezeichen gleich mitschreiben: das Bündel wird genau einmal serialisiert
+        merge_pdfs([r["path"] for r in results if r and Path(r["path"]).exists()], merged_path,
+                   bookmark_structure, pdfs, result_page_counts(results))
+        return get_file_size(merged_path)
+
+    if ADAPTIVE_QUALITY:
+        adaptive = compress_adaptive(pdfs, tmp_dir, merged_path, max_size, worker_peaks=worker_peaks,
+                                     structure=bookmark_structure, dpi_values=dpi_values,
+                                     quality_values=quality_values)
+        best = adaptive and (adaptive[0], "adaptiv", adaptive[1], adaptive[2])
+        engine = "raster"
+    else:
+        engine, best = find_engine_combination(evaluate, verify, max_size, dpi_values, quality_values)
+    print_pool_metrics()
+    if worker_peaks:
+        peak = max(worker_peaks.values())
+        print(f"🧠 Spitzen-RSS je Worker: max {peak:.0f} MB über {len(worker_peaks)} Worker "
+              f"→ Poolgröße nach Speicher: {pool_size_for_memory(peak)} (CPU: {cpu_count()})")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if best is None:
+        print("📉 Direkt zu groß – starte Gruppierung...")
+        grouped = group_pdfs_by_structure(pdfs, bookmark_structure)
+        # Gruppen nacheinander; innerhalb einer Gruppe verteilt compress_documents die Seiten auf alle Worker
+        outputs = [compress_group(grouped[title], title, bookmark_structure, max_size, dpi_values, quality_values,
+                                  progress, tmp_dir,
+                                  output_path.with_name(f"{output_path.stem}-{group_file_suffix(title)}.pdf"))
+                   for title, _ in bookmark_structure if title in grouped]
+        return [output for output in outputs if output]
+
+    dpi, quality, size, results = best
+    print(f"✅ Beste Kombination: {ENGINE_LABELS[engine]}, {dpi} DPI @ Qualität {quality}")
+    print_page_paths(results)
+    shutil.move(str(merged_path), output_path)
+    print(f"✅ Fertig: {output_path.name} ({size/1024/1024:.2f} MB)")
+    print(f"📤 '{output_path.name}' liegt in '{output_path.parent}'.")
+    return [str(output_path)]
+
 def main():
     set_start_method("spawn", force=True)
-
-    pdfs = get_ordered_pdfs()
-    dpi_values = [100, 150, 200, 250, 300]
-    quality_values = [50, 55, 60, 65, 70, 75, 80, 85]
-    bookmark_structure = parse_bookmark_structure()
-
-    if TMP_DIR.exists():
-        shutil.rmtree(TMP_DIR)
-    TMP_DIR.mkdir()
-
-    previous_valid = None
-
-    for dpi in dpi_values:
-        for quality in quality_values:
-            print(f"⚙️ Teste Qualität {quality} @ {dpi} DPI...")
-            args = [(pdf, quality, dpi, TMP_DIR) for pdf in pdfs]
-            with Pool(cpu_count()) as pool:
-                optimized = pool.starmap(compress_pdf_with_quality_and_dpi, args)
-            optimized = [f for f in optimized if f and Path(f).exists()]
-
-            temp_output = "temp_test.pdf"
-            merge_pdfs(optimized, temp_output)
-            size = get_file_size(temp_output)
-            size_mb = size / 1024 / 1024
-            print(f"📦 Ergebnis: {size_mb:.2f} MB")
-
-            if size <= MAX_SIZE_BYTES:
-                previous_valid = (dpi, quality, optimized.copy(), size_mb)
-            else:
-                if previous_valid:
-                    dpi, quality, optimized, size_mb = previous_valid
-                    merge_pdfs(optimized, "temp_merged.pdf")
-                    print("📖 Füge Lesezeichen hinzu...")
-                    add_outline("temp_merged.pdf", bookmark_structure, pdfs)
-                    shutil.move("temp_merged.pdf", OUTPUT_FILE)
-                    shutil.rmtree(TMP_DIR)
-                    print(f"✅ Fertig: {OUTPUT_FILE} ({size_mb:.2f} MB)")
-
-                    anlagen_pdf = SCRIPT_DIR / OUTPUT_FILE
-                    if anlagen_pdf.exists():
-                        SEND_TO.mkdir(parents=True, exist_ok=True)
-                        shutil.move(str(anlagen_pdf), SEND_TO / anlagen_pdf.name)
-                        print(f"📤 '{OUTPUT_FILE}' wurde nach '{SEND_TO.resolve()}' verschoben.")
-                    else:
-                        print(f"⚠️ '{OUTPUT_FILE}' nicht gefunden, nichts verschoben.")
-                    return
-                if not previous_valid and quality == quality_values[0] and dpi == dpi_values[0]:
-                    print("📉 Direkt zu groß – starte Gruppierung...")
-                    grouped = group_pdfs_by_structure(pdfs, bookmark_structure)
-                    tasks = [(grouped[title], title, bookmark_structure) for title, _ in bookmark_structure if title in grouped]
-                    tasks.sort(key=lambda t: len(t[0]), reverse=True)
-                    with get_context("spawn").Pool(min(cpu_count(), len(tasks))) as pool:
-                        pool.starmap(compress_group, tasks)
-                    return
+    return run_compression()
 
 if __name__ == "__main__":
-    main()
+    configure_metrics()
+    with metrics.profiled():
+        main()
+    write_metrics()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Stufenzeiten, Zähler und optionales Profiling für die PDF-Pipeline.
+
+Jede Stufe (Rastern, JPEG-Kodierung, Zusammenfügen, Lesezeichen, ...) wird
+mit `stage()` bzw. `@timed()` gemessen. Worker liefern ihre Messwerte mit
+`take()` zusammen mit den Ergebnissen zurück, der Elternprozess führt sie mit
+`merge()` zusammen. Auf Wunsch entstehen eine Trace-Datei im
+Chrome-Trace-Event-Format (chrome://tracing, Perfetto, speedscope) und ein
+cProfile-Dump (snakeviz, `python -m pstats`).
+"""
+
+import os
+import json
+import time
+import cProfile
+import pstats
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+# === PARAMETER ===
+TRACING = False            # Einzelereignisse für die Trace-Datei sammeln
+PROFILING = False          # cProfile in jedem Prozess mitlaufen lassen
+MAX_TRACE_EVENTS = 200_000
+NOTIFY_INTERVAL = 0.5      # Sekunden zwischen zwei Live-Aktualisierungen
+
+# Ereigniszähler (JPEG-Kodierungen, poppler-Aufrufe, ...)
+COUNTERS = Counter()
+# Stufe → [Aufrufe, Sekunden]; verschachtelte Stufen zählen jeweils inklusive
+STAGES = defaultdict(lambda: [0, 0.0])
+EVENTS = []
+LISTENERS = []
+
+_profiler = None
+_worker_profiles = {}
+_last_notify = 0.0
+
+def take_counters():
+    """Liefert die bisher gezählten Ereignisse und setzt die Zähler zurück."""
+    snapshot = Counter(COUNTERS)
+    COUNTERS.clear()
+    return snapshot
+
+def configure(tracing=None, profiling=None):
+    """Schaltet Trace und Profiling ein oder aus (auch im Worker-Initializer)."""
+    global TRACING, PROFILING, _profiler
+    if tracing is not None:
+        TRACING = tracing
+    if profiling is not None:
+        PROFILING = profiling
+        if not PROFILING:
+            _profiler = None
+
+def reset():
+    global _profiler
+    COUNTERS.clear()
+    STAGES.clear()
+    EVENTS.clear()
+    _worker_profiles.clear()
+    _profiler = None
+
+# === STUFENZEITEN ===
+@contextmanager
+def stage(name):
+    """Misst einen Abschnitt und legt bei aktivem Trace ein Ereignis an."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        record = STAGES[name]
+        record[0] += 1
+        record[1] += end - start
+        if TRACING and len(EVENTS) < MAX_TRACE_EVENTS:
+            # perf_counter ist auf Linux/macOS/Windows systemweit monoton → Worker-Zeitachsen passen zusammen
+            EVENTS.append({"name": name, "cat": "pdf", "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                           "pid": os.getpid(), "tid": threading.get_ident()})
+        notify()
+
+def timed(name=None):
+    """Decorator-Variante von `stage()`; Standardname ist der Funktionsname."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# === PROFILING ===
+@contextmanager
+def profiled():
+    """Lässt cProfile um den Block laufen, falls PROFILING aktiv ist (kumulativ je Prozess)."""
+    global _profiler
+    if not PROFILING:
+        yield
+        return
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+    _profiler.enable()
+    try:
+        yield
+    finally:
+        _profiler.disable()
+
+def profile_stats():
+    """Bisherige cProfile-Daten dieses Prozesses als picklebares Dict (oder None)."""
+    if _profiler is None:
+        return None
+    _profiler.create_stats()
+    return _profiler.stats
+
+# === AUSTAUSCH ZWISCHEN PROZESSEN ===
+def take():
+    """Messwerte dieses Prozesses für die Rückgabe an den Elternprozess; setzt sie zurück.
+
+    Bei aktivem Profiling kommt der kumulative cProfile-Stand des Workers mit.
+    """
+    snapshot = {
+        "pid": os.getpid(),
+        "counters": take_counters(),
+        "stages": {name: tuple(record) for name, record in STAGES.items()},
+        "events": list(EVENTS),
+        "profile": profile_stats() if PROFILING else None,
+    }
+    STAGES.clear()
+    EVENTS.clear()
+    return snapshot
+
+def merge(snapshot):
+    """Übernimmt die Messwerte eines Workers aus `take()`."""
+    COUNTERS.update(snapshot["counters"])
+    for name, (calls, seconds) in snapshot["stages"].items():
+        record = STAGES[name]
+        record[0] += calls
+        record[1] += seconds
+    room = MAX_TRACE_EVENTS - len(EVENTS)
+    if room > 0:
+        EVENTS.extend(snapshot["events"][:room])
+    if snapshot["profile"] is not None:
+        _worker_profiles[snapshot["pid"]] = snapshot["profile"]
+    notify()
+
+# === AUSGABE ===
+def summary(limit=8):
+    """Die zeitintensivsten Stufen als `(Name, Aufrufe, Sekunden)`."""
+    ranked = sorted(((name, calls, seconds) for name, (calls, seconds) in STAGES.items()),
+                    key=lambda item: item[2], reverse=True)
+    return ranked if limit is None else ranked[:limit]
+
+def summary_lines(limit=8):
+    lines = [f"⏱️ {name}: {seconds:.2f} s ({calls}×)" for name, calls, seconds in summary(limit)]
+    if COUNTERS:
+        lines.append("🔢 " + ", ".join(f"{name} {count}" for name, count in sorted(COUNTERS.items())))
+    return lines
+
+def print_summary(limit=8):
+    print("📊 Stufenzeiten (Worker summiert, verschachtelte Stufen inklusive):")
+    for line in summary_lines(limit):
+        print(f"  {line}")
+
+def add_listener(callback):
+    """`callback(lines)` wird höchstens alle NOTIFY_INTERVAL Sekunden mit der Zusammenfassung aufgerufen."""
+    LISTENERS.append(callback)
+
+def remove_listener(callback):
+    if callback in LISTENERS:
+        LISTENERS.remove(callback)
+
+def notify(force=False):
+    global _last_notify
+    if not LISTENERS:
+        return
+    now = time.perf_counter()
+    if not force and now - _last_notify < NOTIFY_INTERVAL:
+        return
+    _last_notify = now
+    lines = summary_lines()
+    for callback in list(LISTENERS):
+        callback(lines)
+
+def write_trace(path):
+    """Schreibt alle gesammelten Ereignisse im Chrome-Trace-Event-Format."""
+    events = list(EVENTS)
+    for pid in sorted({event["pid"] for event in events}):
+        label = "Hauptprozess" if pid == os.getpid() else f"Worker {pid}"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": label}})
+    trace = {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in STAGES.items()},
+            "counters": dict(COUNTERS),
+        },
+    }
+    Path(path).write_text(json.dumps(trace), encoding="utf-8")
+    print(f"🧵 Trace mit {len(EVENTS)} Ereignissen: {path}")
+
+def write_profile(path):
+    """Fasst die cProfile-Daten von Elternprozess und Workern in einer pstats-Datei zusammen."""
+    sources = [stats for stats in [profile_stats(), *_worker_profiles.values()] if stats]
+    if not sources:
+        print("⚠️ Keine Profildaten vorhanden.")
+        return
+    combined = None
+    for stats in sources:
+        holder = _StatsHolder(stats)
+        if combined is None:
+            combined = pstats.Stats(holder)
+        else:
+            combined.add(holder)
+    combined.dump_stats(path)
+    print(f"🔬 Profil aus {len(sources)} Prozess(en): {path}")
+
+class _StatsHolder:
+    """Minimaler Träger für pstats.Stats, der nur `create_stats()` und `stats` braucht."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
@@ -1,53 +1,91 @@
-import os
-import shutil
-from tkinter import Frame, Label, Entry, Button, Text, Scrollbar, END, StringVar
-from tkinter.ttk import Combobox
-from pathlib import Path
-from multiprocessing import set_start_method, get_context, cpu_count
+import time
+import queue
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import Label, Entry, Button, Text, Scrollbar, END, StringVar, DISABLED, NORMAL
+from multiprocessing import set_start_method
+import compress_pdf_metrics as metrics
 from compress_pdf_group import (
-    get_ordered_pdfs,
-    compress_pdf_with_quality_and_dpi,
-    merge_pdfs,
-    get_file_size,
-    parse_bookmark_structure,
-    add_outline,
-    group_pdfs_by_structure,
-    compress_group
+    DPI_VALUES,
+    QUALITY_VALUES,
+    CompressionCancelled,
+    cancel_compression,
+    run_compression,
+    search_pass_bound,
 )
 
-SCRIPT_DIR = Path(__file__).resolve().parent / "Pdf"
-TMP_DIR = SCRIPT_DIR / "tmp_pdf_pages"
-OUTPUT_FILE = "Anlagen.pdf"
-SEND_TO = SCRIPT_DIR / "../Senden"
+POLL_MS = 100
+
+# Ein Hintergrund-Thread genügt: die eigentliche Arbeit verteilt der Pool auf die Prozesse
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-compression")
+
+class _QueueWriter:
+    """Leitet `print` aus dem Hintergrund-Thread zeilenweise in die Ereignis-Queue."""
+
+    def __init__(self, events):
+        self.events = events
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self.events.put(("log", line))
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.events.put(("log", self.buffer))
+            self.buffer = ""
 
 def create_pdf_compression_ui(parent):
     set_start_method("spawn", force=True)
+    events = queue.Queue()
+    state = {"future": None}
 
     # === Steuer-Widgets ===
-    Label(parent, text="Qualität:").grid(row=0, column=0, sticky="e")
-    quality_var = StringVar(value="70")
+    Label(parent, text="Max. Qualität:").grid(row=0, column=0, sticky="e")
+    quality_var = StringVar(value=str(max(QUALITY_VALUES)))
     Entry(parent, textvariable=quality_var, width=5).grid(row=0, column=1, sticky="w")
 
-    Label(parent, text="DPI:").grid(row=0, column=2, sticky="e")
-    dpi_var = StringVar(value="150")
+    Label(parent, text="Max. DPI:").grid(row=0, column=2, sticky="e")
+    dpi_var = StringVar(value=str(max(DPI_VALUES)))
     Entry(parent, textvariable=dpi_var, width=5).grid(row=0, column=3, sticky="w")
 
     Label(parent, text="Max. Größe (MB):").grid(row=0, column=4, sticky="e")
     max_size_var = StringVar(value="1.9")
     Entry(parent, textvariable=max_size_var, width=5).grid(row=0, column=5, sticky="w")
 
-    Button(parent, text="Komprimierung starten", command=lambda: start_compression(
-        dpi_var.get(), quality_var.get(), max_size_var.get(), output_text
-    )).grid(row=0, column=6, padx=10)
+    start_button = Button(parent, text="Komprimierung starten", command=lambda: start_compression(
+        dpi_var.get(), quality_var.get(), max_size_var.get(), output_text, events, state, controls
+    ))
+    start_button.grid(row=0, column=6, padx=10)
+    cancel_button = Button(parent, text="Abbrechen", state=DISABLED, command=lambda: request_cancel(output_text))
+    cancel_button.grid(row=0, column=7, padx=5)
 
     # === Ausgabetextfeld ===
     output_text = Text(parent, height=30, wrap="word")
-    output_text.grid(row=1, column=0, columnspan=7, sticky="nsew", padx=5, pady=5)
+    output_text.grid(row=1, column=0, columnspan=8, sticky="nsew", padx=5, pady=5)
 
     scrollbar = Scrollbar(parent, command=output_text.yview)
-    scrollbar.grid(row=1, column=7, sticky="ns")
+    scrollbar.grid(row=1, column=8, sticky="ns")
     output_text.config(yscrollcommand=scrollbar.set)
 
+    # === Fortschritt und Live-Zusammenfassung der Stufenzeiten ===
+    progress_var = StringVar(value="")
+    Label(parent, textvariable=progress_var, anchor="w").grid(row=2, column=0, columnspan=8, sticky="we", padx=5)
+    metrics_var = StringVar(value="📊 Noch keine Messwerte")
+    Label(parent, textvariable=metrics_var, justify="left", anchor="w", font=("Courier", 9)).grid(
+        row=3, column=0, columnspan=8, sticky="we", padx=5)
+
+    # Aufrufe kommen aus dem Hintergrund-Thread: nur in die Queue, Tk wird im Poll aktualisiert
+    metrics.add_listener(lambda lines: events.put(("metrics", lines)))
+
+    controls = {"start": start_button, "cancel": cancel_button, "progress": progress_var, "metrics": metrics_var}
+    parent.after(POLL_MS, poll_events, parent, events, output_text, state, controls)
+    # Fenster geschlossen: laufende Suche abbrechen, sonst rechnet der Hintergrund-Thread weiter
+    parent.bind("<Destroy>", lambda event: on_destroy(event, parent, state))
+
     # Resize-Verhalten aktivieren
     parent.grid_rowconfigure(1, weight=1)
     parent.grid_columnconfigure(6, weight=1)
@@ -56,7 +94,9 @@ def log(text_widget, message):
     text_widget.insert(END, message + "\n")
     text_widget.see(END)
 
-def start_compression(dpi, quality, max_size, text_widget):
+def start_compression(dpi, quality, max_size, text_widget, events, state, controls):
+    if state["future"] is not None and not state["future"].done():
+        return
     try:
         dpi = int(dpi)
         quality = int(quality)
@@ -65,51 +105,97 @@ def start_compression(dpi, quality, max_size, text_widget):
         log(text_widget, "❌ Ungültige Eingaben – bitte Zahlen angeben.")
         return
 
-    TMP_DIR.mkdir(exist_ok=True)
-    pdfs = get_ordered_pdfs()
-    if not pdfs:
-        log(text_widget, "⚠️ Keine PDF-Dateien im Ordner gefunden.")
+    dpi_values = [value for value in DPI_VALUES if value <= dpi]
+    quality_values = [value for value in QUALITY_VALUES if value <= quality]
+    if not dpi_values or not quality_values:
+        log(text_widget, f"❌ Max. DPI/Qualität unter dem kleinsten Suchwert ({min(DPI_VALUES)} DPI, Qualität {min(QUALITY_VALUES)}).")
         return
 
-    max_size_bytes = max_size * 1024 * 1024
-    log(text_widget, f"⚙️ Starte Kompression mit Qualität {quality} @ {dpi} DPI (max. {max_size} MB)")
-
-    args = [(pdf, quality, dpi, TMP_DIR) for pdf in pdfs]
-    with get_context("spawn").Pool(cpu_count()) as pool:
-        results = pool.starmap(compress_pdf_with_quality_and_dpi, args)
-    results = [r for r in results if r and Path(r).exists()]
-
-    if not results:
-        log(text_widget, "❌ Keine PDFs erfolgreich konvertiert.")
-        return
-
-    temp_output = "temp_test.pdf"
-    merge_pdfs(results, temp_output)
-    size = get_file_size(temp_output)
-    size_mb = size / 1024 / 1024
-    log(text_widget, f"📦 Gesamtgröße: {size_mb:.2f} MB")
-
-    if size <= max_size_bytes:
-        log(text_widget, "✅ Direkte Kombination passt! Füge Lesezeichen hinzu...")
-        bookmark_structure = parse_bookmark_structure()
-        add_outline(temp_output, bookmark_structure, pdfs)
-        shutil.move(temp_output, OUTPUT_FILE)
+    log(text_widget, f"⚙️ Starte Suche bis Qualität {max(quality_values)} @ {max(dpi_values)} DPI (max. {max_size} MB)")
+    metrics.reset()
+    state.update(started=time.perf_counter(), pages=0, last_done=0, passes=0,
+                 expected_passes=search_pass_bound(dpi_values, quality_values))
+    controls["start"].config(state=DISABLED)
+    controls["cancel"].config(state=NORMAL)
+    controls["progress"].set("⏳ Starte Worker...")
+
+    def progress(done, total):
+        events.put(("progress", done, total))
+
+    def job():
+        writer = _QueueWriter(events)
+        with redirect_stdout(writer):
+            try:
+                outputs = run_compression(max_size * 1024 * 1024, dpi_values, quality_values, progress)
+                events.put(("done", outputs))
+            except CompressionCancelled:
+                events.put(("cancelled",))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                writer.flush()
+
+    state["future"] = _executor.submit(job)
+
+def request_cancel(text_widget):
+    log(text_widget, "🛑 Abbruch angefordert – beende Worker...")
+    cancel_compression()
+
+def on_destroy(event, parent, state):
+    if event.widget is parent and state["future"] is not None and not state["future"].done():
+        cancel_compression()
+
+def poll_events(parent, events, text_widget, state, controls):
+    try:
+        while True:
+            event = events.get_nowait()
+            kind = event[0]
+            if kind == "log":
+                log(text_widget, event[1])
+            elif kind == "metrics":
+                controls["metrics"].set("\n".join(event[1]) or "📊 Noch keine Messwerte")
+            elif kind == "progress":
+                update_progress(state, controls, *event[1:])
+            else:
+                finish(kind, event, text_widget, controls)
+    except queue.Empty:
+        pass
+    parent.after(POLL_MS, poll_events, parent, events, text_widget, state, controls)
+
+def update_progress(state, controls, done, total):
+    # Ein neuer Durchlauf beginnt wieder bei wenigen Seiten
+    if done <= state["last_done"] or state["passes"] == 0:
+        state["passes"] += 1
+        state["pages"] += done
     else:
-        log(text_widget, "📉 Datei zu groß – starte Gruppierung...")
-        bookmark_structure = parse_bookmark_structure()
-        grouped = group_pdfs_by_structure(pdfs, bookmark_structure)
-        tasks = [(grouped[title], title, bookmark_structure) for title, _ in bookmark_structure if title in grouped]
-        tasks.sort(key=lambda t: len(t[0]), reverse=True)
-        with get_context("spawn").Pool(min(cpu_count(), len(tasks))) as pool:
-            pool.starmap(compress_group, tasks)
-
-    # Verschieben
-    final_pdf = SCRIPT_DIR / OUTPUT_FILE
-    if final_pdf.exists():
-        SEND_TO.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(final_pdf), SEND_TO / final_pdf.name)
-        log(text_widget, f"📤 '{OUTPUT_FILE}' wurde nach '{SEND_TO.resolve()}' verschoben.")
+        state["pages"] += done - state["last_done"]
+    state["last_done"] = done
+
+    elapsed = time.perf_counter() - state["started"]
+    rate = state["pages"] / elapsed if elapsed > 0 else 0
+    text = f"📈 Durchlauf {state['passes']}/≈{state['expected_passes']} · {done}/{total} Seiten"
+    if rate > 0:
+        remaining_passes = max(0, state["expected_passes"] - state["passes"])
+        eta = ((total - done) + remaining_passes * total) / rate
+        text += f" · {rate:.1f} Seiten/s · Rest ≈ {int(eta // 60)}:{int(eta % 60):02d}"
+    controls["progress"].set(text)
+
+def finish(kind, event, text_widget, controls):
+    controls["start"].config(state=NORMAL)
+    controls["cancel"].config(state=DISABLED)
+    if kind == "done":
+        outputs = event[1]
+        controls["progress"].set("✅ Fertig" if outputs else "⚠️ Keine Ausgabe erzeugt")
+        for output in outputs:
+            log(text_widget, f"📄 {output}")
+    elif kind == "cancelled":
+        controls["progress"].set("🛑 Abgebrochen")
+        log(text_widget, "🛑 Kompression abgebrochen.")
     else:
-        log(text_widget, f"⚠️ '{OUTPUT_FILE}' nicht erzeugt.")
-    
-    shutil.rmtree(TMP_DIR, ignore_errors=True)
+        controls["progress"].set("❌ Fehler")
+        log(text_widget, f"❌ Fehler: {event[1]}")
+
+    metrics.notify(force=True)
+    log(text_widget, "📊 Stufenzeiten (Worker summiert):")
+    for line in metrics.summary_lines():
+        log(text_widget, f"  {line}")
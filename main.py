@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
+import time
+
+START = time.perf_counter()
+
+import importlib
 import tkinter as tk
 from tkinter import ttk
 
-from word_finder_ui import create_word_finder_ui
-from compress_pdf_ui import create_pdf_compression_ui
+# Reiter → (Modul, Aufbaufunktion); die Module samt PDF-/DOCX-Bibliotheken werden erst beim ersten Öffnen geladen
+TABS = [
+    ("Word-Finder", "word_finder_ui", "create_word_finder_ui"),
+    ("PDF-Komprimierung", "compress_pdf_ui", "create_pdf_compression_ui"),
+]
+
+def elapsed_ms(since=START):
+    return (time.perf_counter() - since) * 1000
 
 class DocumentToolboxApp(tk.Tk):
     def __init__(self):
@@ -11,18 +22,41 @@ class DocumentToolboxApp(tk.Tk):
         self.title("Document-Toolbox")
         self.geometry("1000x700")
 
-        notebook = ttk.Notebook(self)
-        notebook.pack(fill="both", expand=True)
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill="both", expand=True)
+
+        # Leere Reiter; der Inhalt entsteht in build_tab, sobald ein Reiter zum ersten Mal sichtbar wird
+        self.tabs = {}
+        for title, module_name, factory in TABS:
+            tab = ttk.Frame(self.notebook)
+            self.notebook.add(tab, text=title)
+            self.tabs[str(tab)] = (title, module_name, factory)
+        self.built = set()
+
+        self.bind("<Map>", self.on_first_map)
+
+    def on_first_map(self, event):
+        if event.widget is not self:
+            return
+        self.unbind("<Map>")
+        print(f"⏱️ Start: Fenster nach {elapsed_ms():.0f} ms")
+        # Erst nach dem ersten Zeichnen den sichtbaren Reiter aufbauen, danach bei jedem Reiterwechsel
+        self.after_idle(self.after, 1, self.build_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_tab())
 
-        # Reiter für Word-Finder
-        word_tab = ttk.Frame(notebook)
-        notebook.add(word_tab, text="Word-Finder")
-        create_word_finder_ui(word_tab)
+    def build_tab(self):
+        tab = self.notebook.select()
+        if not tab or tab in self.built:
+            return
+        self.built.add(tab)
+        title, module_name, factory = self.tabs[tab]
 
-        # Reiter für PDF-Komprimierung
-        pdf_tab = ttk.Frame(notebook)
-        notebook.add(pdf_tab, text="PDF-Komprimierung")
-        create_pdf_compression_ui(pdf_tab)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        imported = time.perf_counter()
+        getattr(module, factory)(self.nametowidget(tab))
+        print(f"⏱️ Reiter {title}: Import {(imported - start) * 1000:.0f} ms, "
+              f"Aufbau {elapsed_ms(imported):.0f} ms, bereit nach {elapsed_ms():.0f} ms seit Start")
 
 if __name__ == "__main__":
     app = DocumentToolboxApp()
@@ -0,0 +1,393 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+# === PARAMETER ===
+INDEX_VERSION = 2
+INDEX_DIR_NAME = ".word_index"
+# Ein Wort = Folge von Buchstaben (inkl. Umlaute/ß); Ziffern, Bindestriche und Satzzeichen trennen
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+INDEX_WORKERS = None        # Prozesse für die Hintergrund-Indexierung (Standard: CPU-Anzahl)
+
+# Im Speicher gehaltene Indizes (Pfad → Index); gültig, solange mtime und Größe passen
+_indexes = {}
+
+# === TOKENISIERUNG ===
+def normalize(text):
+    """NFC, damit zerlegte Umlaute (u + ¨) als ein Buchstabe zählen."""
+    return text if unicodedata.is_normalized("NFC", text) else unicodedata.normalize("NFC", text)
+
+def tokenize(text):
+    """Wörter als `(kleingeschrieben, start, ende)`; die Positionen beziehen sich auf `normalize(text)`.
+
+    Gemeinsamer Tokenizer für Häufigkeiten, Index, Synonymprüfung und Ersetzen:
+    „Haus,“ zählt als „haus“, „Haus-Tür“ als „haus“ und „tür“.
+    """
+    return [(m.group().lower(), m.start(), m.end()) for m in WORD_PATTERN.finditer(normalize(text))]
+
+def count_words(text):
+    """Wörter für die Häufigkeitsliste."""
+    return [word for word, _, _ in tokenize(text)]
+
+def paragraph_words(text):
+    return {word for word, _, _ in tokenize(text)}
+
+# === MEHRFACHSUCHE (AHO–CORASICK ÜBER WORT-TOKEN) ===
+class TermMatcher:
+    """Findet beliebig viele Begriffe (auch Wortfolgen) in einem Durchlauf über die Token.
+
+    Der Automat arbeitet auf ganzen Wörtern statt Zeichen, Wortgrenzen
+    sind damit automatisch korrekt („Haus“ trifft nicht „Hausbau“).
+    """
+
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.first_words = set()
+        for term in terms:
+            words = [word for word, _, _ in tokenize(term)]
+            if not words:
+                continue
+            self.first_words.add(words[0])
+            node = 0
+            for word in words:
+                if word not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][word] = len(self.goto) - 1
+                node = self.goto[node][word]
+            self.output[node].append((term, len(words)))
+
+        # Fehlerlinks in Breitensuche; Ausgaben der Suffixe werden übernommen
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] += self.output[self.fail[child]]
+
+    def scan(self, tokens):
+        """Liefert `(begriff, start, ende)` für jeden Treffer in der Token-Liste aus tokenize()."""
+        node = 0
+        for i, (word, _, end) in enumerate(tokens):
+            while node and word not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(word, 0)
+            for term, length in self.output[node]:
+                yield term, tokens[i - length + 1][1], end
+
+# === INDEX AUFBAUEN ===
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_index(file_path):
+    """Index eines Dokuments: Absätze, Worthäufigkeiten und Wort → Absatznummern."""
+    # python-docx (lxml) erst hier laden: gültige Indizes kommen ohne aus, der Start bleibt schnell
+    from docx import Document as DocxDocument
+    paragraphs = [para.text for para in DocxDocument(file_path).paragraphs]
+    mtime_ns, size = file_signature(file_path)
+    index = {
+        "version": INDEX_VERSION,
+        "mtime_ns": mtime_ns,
+        "size": size,
+        "sha256": file_sha256(file_path),
+        "paragraphs": list(paragraphs),
+        "counts": Counter(),
+        "positions": {},
+    }
+    for i, text in enumerate(index["paragraphs"]):
+        _add_paragraph(index, i, text)
+    _finish(index)
+    return index
+
+def _add_paragraph(index, i, text):
+    index["counts"].update(count_words(text))
+    for word in paragraph_words(text):
+        index["positions"].setdefault(word, []).append(i)
+
+def _remove_paragraph(index, i, text):
+    index["counts"].subtract(count_words(text))
+    for word in paragraph_words(text):
+        offsets = index["positions"].get(word)
+        if offsets and i in offsets:
+            offsets.remove(i)
+            if not offsets:
+                del index["positions"][word]
+    index["counts"] += Counter()  # Einträge mit 0 entfernen
+
+def _finish(index):
+    """Abgeleitete Felder: kleingeschriebene Absätze und Volltext."""
+    index["lower"] = [text.lower() for text in index["paragraphs"]]
+    index["text"] = " ".join(index["lower"])
+
+# === PERSISTENZ ===
+def index_path(file_path):
+    file_path = Path(file_path).resolve()
+    name = hashlib.sha1(str(file_path).encode()).hexdigest()[:16]
+    return file_path.parent / INDEX_DIR_NAME / f"{file_path.stem}_{name}.json"
+
+def save_index(file_path, index):
+    path = index_path(file_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {key: index[key] for key in ("version", "mtime_ns", "size", "sha256", "paragraphs", "positions")}
+    data["counts"] = dict(index["counts"])
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_index(file_path):
+    path = index_path(file_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    index["counts"] = Counter(index["counts"])
+    _finish(index)
+    return index
+
+def cached_index(file_path):
+    """Index aus dem Speicher oder von der Platte, falls er noch zur Datei passt – sonst None.
+
+    Stimmt nur die mtime nicht, der Inhalt (SHA-256) aber schon, wird der
+    gespeicherte Index weiterverwendet.
+    """
+    key = str(Path(file_path).resolve())
+    mtime_ns, size = file_signature(file_path)
+    index = _indexes.get(key)
+    if index and (index["mtime_ns"], index["size"]) == (mtime_ns, size):
+        return index
+
+    index = load_index(file_path)
+    if not index or index["size"] != size:
+        return None
+    if index["mtime_ns"] != mtime_ns:
+        if index["sha256"] != file_sha256(file_path):
+            return None
+        index["mtime_ns"] = mtime_ns
+        save_index(file_path, index)
+    _indexes[key] = index
+    return index
+
+def get_index(file_path):
+    """Index aus dem Speicher, von der Platte oder neu gebaut – geparst wird nur bei geänderter Datei."""
+    index = cached_index(file_path)
+    if index is None:
+        index = build_index(file_path)
+        save_index(file_path, index)
+        _indexes[str(Path(file_path).resolve())] = index
+    return index
+
+def update_paragraphs(file_path, index, changed):
+    """Trägt geänderte Absätze (`{nummer: neuer_text}`) ein, nachdem die Datei gespeichert wurde.
+
+    Nur die betroffenen Wörter werden angepasst; danach stimmt der Index
+    wieder mit mtime, Größe und Hash der Datei überein.
+    """
+    for i, text in changed.items():
+        _remove_paragraph(index, i, index["paragraphs"][i])
+        index["paragraphs"][i] = text
+        _add_paragraph(index, i, text)
+    for offsets in index["positions"].values():
+        offsets.sort()
+    index["mtime_ns"], index["size"] = file_signature(file_path)
+    index["sha256"] = file_sha256(file_path)
+    _finish(index)
+    save_index(file_path, index)
+    _indexes[str(Path(file_path).resolve())] = index
+    return index
+
+# === ABFRAGEN ===
+def paragraphs_with_word(index, word):
+    return index["positions"].get(word.lower(), [])
+
+def find_terms(index, terms):
+    """Alle Treffer `(absatz, begriff, start, ende)` der Begriffe – ein Durchlauf je Kandidatenabsatz.
+
+    Kandidaten sind nur Absätze, die laut Index das erste Wort eines Begriffs enthalten.
+    """
+    matcher = TermMatcher(terms)
+    candidates = sorted({i for word in matcher.first_words for i in index["positions"].get(word, [])})
+    return [(i, term, start, end)
+            for i in candidates
+            for term, start, end in matcher.scan(tokenize(index["paragraphs"][i]))]
+
+def present_terms(index, terms):
+    """Die Begriffe aus `terms`, die als ganze Wörter bzw. Wortfolgen im Dokument vorkommen."""
+    return {term for _, term, _, _ in find_terms(index, terms)}
+
+# === ERSETZEN ===
+def replace_terms(file_path, replacements, last_only=True):
+    """Ersetzt mehrere Wörter in einem Zug und speichert das Dokument genau einmal.
+
+    `replacements` ist `{alt: neu}`. Mit `last_only` wird wie bisher nur das
+    letzte Vorkommen je Wort ersetzt, sonst jedes. Rückgabe: Liste
+    `(absatz, alt, neu)` der Ersetzungen.
+    """
+    index = get_index(file_path)
+    matches = find_terms(index, replacements)
+    if last_only:
+        last = {}
+        for match in matches:
+            last[match[1]] = match
+        matches = list(last.values())
+    if not matches:
+        return []
+
+    from docx import Document as DocxDocument
+    doc = DocxDocument(file_path)
+    changed, done, limit = {}, [], {}
+    # Von hinten nach vorne, damit die Positionen davor gültig bleiben; Überlappungen fallen weg
+    for i, term, start, end in sorted(matches, key=lambda m: (m[0], m[2]), reverse=True):
+        if end > limit.get(i, end):
+            continue
+        limit[i] = start
+        text = changed.get(i, normalize(index["paragraphs"][i]))
+        changed[i] = text[:start] + replacements[term] + text[end:]
+        done.append((i, term, replacements[term]))
+    for i, text in changed.items():
+        doc.paragraphs[i].text = text
+    doc.save(file_path)
+    update_paragraphs(file_path, index, changed)
+    return sorted(done)
+
+def corpus_statistics(indexes, min_count=2, exclude=()):
+    """Über alle Dokumente: Wörter, die in mindestens einem Dokument `min_count`-mal vorkommen.
+
+    Rückgabe: `(wort, summe, dokumente)` nach Summe absteigend; gezählt werden
+    nur die Dokumente, in denen das Wort wiederholt wird.
+    """
+    totals, documents = Counter(), Counter()
+    for index in indexes:
+        for word, count in index["counts"].items():
+            if count >= min_count and word not in exclude:
+                totals[word] += count
+                documents[word] += 1
+    return [(word, total, documents[word]) for word, total in totals.most_common()]
+
+# === HINTERGRUND-INDEXIERUNG ===
+def _index_worker(file_path):
+    return get_index(file_path)
+
+class BackgroundIndexer:
+    """Indexiert die .docx eines Ordners in einem Prozesspool und erkennt Änderungen im Ordner.
+
+    Die Oberfläche ruft `collect()` und `scan()` regelmäßig per `after()` auf;
+    fertige Indizes landen im Speicher-Cache, sodass get_index sofort antwortet.
+    """
+
+    def __init__(self, folder, workers=INDEX_WORKERS):
+        self.folder = folder
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.pending = {}    # Pfad → Future
+        self.known = {}      # Pfad → (mtime_ns, Größe) beim letzten Einreichen
+
+    def _pool(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        return self.executor
+
+    def is_indexed(self, file_path):
+        """Aktueller Index im Speicher oder auf der Platte – dann braucht es keinen Worker."""
+        try:
+            return cached_index(file_path) is not None
+        except OSError:
+            return False
+
+    def submit(self, file_path):
+        """Reiht ein Dokument ein, falls es weder fertig noch unterwegs ist."""
+        if file_path in self.pending:
+            return
+        try:
+            self.known[file_path] = file_signature(file_path)
+        except OSError:
+            return
+        if not self.is_indexed(file_path):
+            self.pending[file_path] = self._pool().submit(_index_worker, file_path)
+
+    def submit_all(self, file_paths):
+        for file_path in file_paths:
+            self.submit(file_path)
+
+    def collect(self):
+        """Übernimmt fertige Indizes in den Speicher-Cache; Rückgabe: die fertig gewordenen Pfade."""
+        finished = []
+        for file_path, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[file_path]
+            try:
+                index = future.result()
+            except Exception as e:
+                print(f"❌ Indexierung fehlgeschlagen: {file_path}: {e}")
+                continue
+            # Während der Indexierung geändert? Dann verwirft scan() das Ergebnis und reiht neu ein
+            if (index["mtime_ns"], index["size"]) == self.known.get(file_path):
+                _indexes[str(Path(file_path).resolve())] = index
+                finished.append(file_path)
+        return finished
+
+    def scan(self):
+        """Vergleicht den Ordner mit dem letzten Stand; neue und geänderte Dokumente werden eingereiht.
+
+        Rückgabe: `(neu, entfernt, geändert)` als Dateinamen.
+        """
+        current = {f for f in os.listdir(self.folder) if f.endswith(".docx") and not f.startswith("~$")}
+        known = {os.path.basename(path): path for path in self.known}
+        added = sorted(current - known.keys())
+        removed = sorted(known.keys() - current)
+        changed = []
+        for name in current & known.keys():
+            path = known[name]
+            try:
+                if file_signature(path) != self.known[path]:
+                    changed.append(name)
+            except OSError:
+                continue
+        for name in removed:
+            self.known.pop(known[name], None)
+            future = self.pending.pop(known[name], None)
+            if future:
+                future.cancel()
+        for name in added + changed:
+            self.submit(os.path.join(self.folder, name))
+        return added, removed, changed
+
+    def progress(self):
+        done = sum(1 for path in self.known if self.is_indexed(path))
+        return done, len(self.known)
+
+    def shutdown(self):
+        """Verwirft wartende Aufträge; beim Schließen des Fensters aufrufen, nicht per atexit:
+        der atexit-Hook des ProcessPoolExecutor wartet sonst vorher alle Aufträge ab."""
+        # Selbst abbrechen: ohne Referenz auf den Executor verwirft dessen Verwaltungsthread cancel_futures
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
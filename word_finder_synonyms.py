@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Synonym-Suche für den Word-Finder: offline, gecacht und ohne den Tk-Thread zu blockieren.
+
+Reihenfolge je Wort: lokaler OpenThesaurus-Dump (falls importiert) →
+SQLite-Cache früherer Abfragen → HTTP-Abfrage an `base_url` über eine
+gepoolte requests.Session mit Timeout. Alles liegt in einer SQLite-Datei.
+
+    python3 word_finder_synonyms.py --import openthesaurus.txt   # Dump von openthesaurus.de/about/download
+    python3 word_finder_synonyms.py --lookup Haus
+    python3 word_finder_synonyms.py --lookup Haus --base-url http://127.0.0.1:8000   # z. B. gegen einen Stub-Server
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# === PARAMETER ===
+API_BASE_URL = os.environ.get("OPENTHESAURUS_URL", "https://www.openthesaurus.de")
+API_TIMEOUT = (3.05, 10)          # Verbindungsaufbau, Antwort (Sekunden)
+CACHE_MAX_ENTRIES = 10_000        # LRU-Grenze für Online-Ergebnisse
+LOOKUP_THREADS = 2
+DB_FILE = os.path.join(os.getcwd(), "Word", ".synonyms.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (word TEXT PRIMARY KEY, terms TEXT NOT NULL, fetched REAL NOT NULL,
+                                  used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS cache_used ON cache (used);
+CREATE TABLE IF NOT EXISTS synsets (id INTEGER PRIMARY KEY, terms TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS thesaurus (word TEXT NOT NULL, synset INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS thesaurus_word ON thesaurus (word);
+"""
+
+def lookup_key(term):
+    """Suchschlüssel: ohne Klammerzusätze wie „(ugs.)“, kleingeschrieben."""
+    return re.sub(r"\s*\([^)]*\)", "", term).strip().lower()
+
+# === SPEICHER ===
+class SynonymStore:
+    """SQLite-Datei mit LRU-Cache der Online-Ergebnisse und dem optional importierten Dump."""
+
+    def __init__(self, path=DB_FILE, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def has_thesaurus(self):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM synsets LIMIT 1").fetchone() is not None
+
+    def thesaurus_lookup(self, word):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT s.terms FROM thesaurus t JOIN synsets s ON s.id = t.synset WHERE t.word = ?",
+                (lookup_key(word),)).fetchall()
+        terms = []
+        for (synset,) in rows:
+            terms.extend(json.loads(synset))
+        return terms
+
+    def cache_get(self, word):
+        key = word.lower()
+        with self.lock:
+            row = self.db.execute("SELECT terms FROM cache WHERE word = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE cache SET used = ? WHERE word = ?", (time.time(), key))
+            self.db.commit()
+        return json.loads(row[0])
+
+    def cache_put(self, word, terms):
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                            (word.lower(), json.dumps(terms, ensure_ascii=False), now, now))
+            # Älteste Einträge (nach letzter Nutzung) über der Grenze entfernen
+            self.db.execute("DELETE FROM cache WHERE word IN (SELECT word FROM cache ORDER BY used DESC "
+                            "LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self.db.commit()
+
+    def import_thesaurus(self, dump_path):
+        """Lädt den OpenThesaurus-Textdump (eine Synonymgruppe je Zeile, `;`-getrennt). Rückgabe: Gruppenanzahl."""
+        synsets = 0
+        with self.lock, open(dump_path, "r", encoding="utf-8") as f:
+            self.db.execute("DELETE FROM thesaurus")
+            self.db.execute("DELETE FROM synsets")
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                terms = [term.strip() for term in line.split(";") if term.strip()]
+                if len(terms) < 2:
+                    continue
+                synsets += 1
+                self.db.execute("INSERT INTO synsets VALUES (?, ?)", (synsets, json.dumps(terms, ensure_ascii=False)))
+                self.db.executemany("INSERT INTO thesaurus VALUES (?, ?)",
+                                    {(lookup_key(term), synsets) for term in terms})
+            self.db.commit()
+        return synsets
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+# === DIENST ===
+class SynonymService:
+    """Synonyme aus Dump, Cache oder Netz; `submit()` liefert ein Future für die Tk-Oberfläche."""
+
+    def __init__(self, db_path=DB_FILE, base_url=API_BASE_URL, timeout=API_TIMEOUT, threads=LOOKUP_THREADS):
+        self.store = SynonymStore(db_path)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=threads)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="synonyms")
+        self.offline = self.store.has_thesaurus()
+        self._memory = lru_cache(maxsize=4096)(self._lookup)
+
+    def fetch(self, word):
+        response = self.session.get(f"{self.base_url}/synonyme/search",
+                                    params={"q": word, "format": "application/json"}, timeout=self.timeout)
+        response.raise_for_status()
+        terms = []
+        for synset in response.json().get("synsets", []):
+            terms.extend(term["term"] for term in synset.get("terms", []))
+        return terms
+
+    def _lookup(self, word):
+        if self.offline:
+            terms = self.store.thesaurus_lookup(word)
+            if terms:
+                return tuple(terms)
+        terms = self.store.cache_get(word)
+        if terms is None:
+            terms = self.fetch(word)
+            self.store.cache_put(word, terms)
+        return tuple(terms)
+
+    def lookup(self, word):
+        """Synonyme als Liste, ohne das Wort selbst und ohne Dubletten (blockierend)."""
+        key = lookup_key(word)
+        seen, result = {key}, []
+        for term in self._memory(word):
+            if lookup_key(term) not in seen:
+                seen.add(lookup_key(term))
+                result.append(term)
+        return result
+
+    def submit(self, word):
+        return self.executor.submit(self.lookup, word)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+        self.store.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Synonym-Speicher des Word-Finders")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite-Datei")
+    parser.add_argument("--import", dest="dump", help="OpenThesaurus-Textdump importieren")
+    parser.add_argument("--lookup", help="Synonyme für ein Wort anzeigen")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="Basis-URL der OpenThesaurus-API")
+    args = parser.parse_args()
+
+    if args.dump:
+        start = time.perf_counter()
+        count = SynonymStore(args.db).import_thesaurus(args.dump)
+        print(f"📚 {count} Synonymgruppen importiert ({time.perf_counter() - start:.1f} s)")
+    if args.lookup:
+        service = SynonymService(args.db, args.base_url)
+        start = time.perf_counter()
+        terms = service.lookup(args.lookup)
+        print(f"🔎 {args.lookup}: {', '.join(terms) or '–'} ({(time.perf_counter() - start) * 1e6:.0f} µs)")
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 import os
-import re
-import requests
-from collections import Counter
-from tkinter import Frame, Button, Label, Text, Entry, Scrollbar, END, messagebox
+from tkinter import Frame, Button, Label, Text, Entry, Scrollbar, END, StringVar, messagebox
 
-from docx import Document as DocxDocument
+from word_finder_index import (
+    get_index,
+    paragraphs_with_word,
+    present_terms,
+    replace_terms,
+    corpus_statistics,
+    BackgroundIndexer,
+)
 
 word_folder = os.path.join(os.getcwd(), "Word")
 fuellwort_datei = os.path.join(word_folder, "Fuellwoerter.txt")
+POLL_MS = 200            # Abholen fertiger Indizes
+SCAN_INTERVAL_MS = 2000  # Ordner auf neue/geänderte Dokumente prüfen
+PREFETCH_NEIGHBOURS = 2
+SYNONYM_POLL_MS = 50     # Abholen fertiger Synonym-Abfragen
 
 def load_fuellwoerter():
     if os.path.exists(fuellwort_datei):
@@ -21,54 +29,64 @@ def add_fuellwort(word):
     fuellwoerter.add(word)
 
 def replace_word_in_docx(file_path, old_word, new_word):
-    doc = DocxDocument(file_path)
-    pattern = re.compile(r'\b' + re.escape(old_word) + r'\b', flags=re.IGNORECASE)
+    replace_words_in_docx(file_path, {old_word: new_word})
 
-    matches = []
-    for i, para in enumerate(doc.paragraphs):
-        for m in pattern.finditer(para.text):
-            matches.append((i, m.start(), m.end()))
-
-    if not matches:
+def replace_words_in_docx(file_path, replacements):
+    """Ersetzt je Wort das letzte Vorkommen; alle Wörter in einem Durchlauf, gespeichert wird einmal."""
+    done = replace_terms(file_path, replacements)
+    if not done:
         messagebox.showinfo("Info", "Wort nicht gefunden.")
         return
-
-    last_para_idx, start, end = matches[-1]
-    para = doc.paragraphs[last_para_idx]
-
-    text = para.text
-    new_text = text[:start] + new_word + text[end:]
-    para.text = new_text
-
-    doc.save(file_path)
-    messagebox.showinfo("Erfolg", f"Ersetzt im Absatz {last_para_idx}: '{old_word}' durch '{new_word}'.")
+    missing = sorted(set(replacements) - {old for _, old, _ in done})
+    lines = [f"Absatz {i}: '{old}' durch '{new}'" for i, old, new in done]
+    if missing:
+        lines.append("Nicht gefunden: " + ", ".join(missing))
+    messagebox.showinfo("Erfolg", "Ersetzt im " + "\n".join(lines))
 
 def show_sentence_with_word(file_path, word, text_widget):
-    doc = DocxDocument(file_path)
-    for para in doc.paragraphs:
-        if word in para.text.lower():
-            text_widget.delete(1.0, END)
-            text_widget.insert(END, para.text.strip())
-            break
+    index = get_index(file_path)
+    offsets = paragraphs_with_word(index, word)
+    if not offsets:
+        offsets = [i for i, lower in enumerate(index["lower"]) if word in lower][:1]
+    if offsets:
+        text_widget.delete(1.0, END)
+        text_widget.insert(END, index["paragraphs"][offsets[0]].strip())
+
+def synonym_service():
+    """Erst beim ersten Klick anlegen – requests und die SQLite-Datei bremsen sonst den Start."""
+    global synonyms
+    if synonyms is None:
+        from word_finder_synonyms import SynonymService
+        synonyms = SynonymService(os.path.join(word_folder, ".synonyms.sqlite"))
+    return synonyms
 
 def show_synonyms(word, text_widget):
+    """Startet die Abfrage im Hintergrund; show_synonym_result holt das Ergebnis per after() ab."""
+    global synonym_request
+    text_widget.delete(1.0, END)
+    text_widget.insert(END, f"Synonym-Vorschläge für '{word}':\n⏳ Suche...\n")
+    future = synonym_service().submit(word)
+    # Nur die zuletzt angeklickte Abfrage darf das Textfeld füllen
+    synonym_request = future
+    text_widget.after(SYNONYM_POLL_MS, show_synonym_result, word, future, doc_path(doc_files[current_index]),
+                      text_widget)
+
+def show_synonym_result(word, future, file_path, text_widget):
+    if future is not synonym_request:
+        return
+    if not future.done():
+        text_widget.after(SYNONYM_POLL_MS, show_synonym_result, word, future, file_path, text_widget)
+        return
     text_widget.delete(1.0, END)
     text_widget.insert(END, f"Synonym-Vorschläge für '{word}':\n")
     try:
-        response = requests.get(f"https://www.openthesaurus.de/synonyme/search?q={word}&format=application/json")
-        data = response.json()
-        synsets = data.get("synsets", [])
-        synonyms = []
-        for synset in synsets:
-            synonyms.extend(term["term"] for term in synset.get("terms", []))
-        if synonyms:
-            filename = doc_files[current_index]
-            file_path = os.path.join(word_folder, filename)
-            doc_text = " ".join([para.text.lower() for para in DocxDocument(file_path).paragraphs])
+        found = future.result()
+        if found:
+            # Alle Synonyme in einem Durchlauf gegen das Dokument prüfen
+            present = present_terms(get_index(file_path), found)
             count = 0
-            for s in synonyms:
-                pattern = r'\b' + re.escape(s.lower()) + r'\b'
-                if not re.search(pattern, doc_text):
+            for s in found:
+                if s not in present:
                     text_widget.insert(END, "- " + s + "\n")
                     count += 1
                 if count == 3:
@@ -80,8 +98,9 @@ def show_synonyms(word, text_widget):
     except Exception as e:
         text_widget.insert(END, f"Fehler beim Abrufen von Synonymen: {e}\n")
 
-def load_doc_words():
-    global word_buttons
+def load_doc_words(wait=True):
+    """Zeigt die Wortliste des aktuellen Dokuments; ist es noch nicht indexiert, übernimmt poll_indexer."""
+    global word_buttons, waiting_for
     word_buttons.clear()
     for widget in word_frame.winfo_children():
         widget.destroy()
@@ -96,9 +115,14 @@ def load_doc_words():
     output_text.delete(1.0, END)
     output_text.insert(END, f"Dokument: {filename}\n")
 
-    doc_text = " ".join([para.text for para in DocxDocument(file_path).paragraphs])
-    words = [word.lower() for word in doc_text.split() if word.isalpha()]
-    word_counts = Counter(words)
+    waiting_for = None
+    if wait and not indexer.is_indexed(file_path):
+        indexer.submit(file_path)
+        if file_path in indexer.pending:
+            waiting_for = file_path
+            output_text.insert(END, "⏳ Wird im Hintergrund indexiert...\n")
+            return
+    word_counts = get_index(file_path)["counts"]
 
     for word, count in word_counts.items():
         if count > 1 and word not in fuellwoerter:
@@ -137,6 +161,15 @@ def replace_word_ui(word, frame):
 
     Button(frame, text="Bestätigen", command=on_confirm).pack(side="left")
 
+    def on_queue():
+        new_word = entry.get().strip()
+        if new_word:
+            pending_replacements[word] = new_word
+            batch_var.set(f"Vorgemerkte ersetzen ({len(pending_replacements)})")
+            frame.destroy()
+
+    Button(frame, text="Vormerken", command=on_queue).pack(side="left")
+
     def on_show_sentence():
         filename = doc_files[current_index]
         file_path = os.path.join(word_folder, filename)
@@ -148,30 +181,108 @@ def replace_word_ui(word, frame):
     Button(frame, text="Satz anzeigen", command=on_show_sentence).pack(side="left")
     Button(frame, text="Synonyme", command=on_show_synonyms).pack(side="left")
 
+def replace_pending():
+    """Alle vorgemerkten Ersetzungen auf einmal – das Dokument wird nur einmal geschrieben."""
+    if not pending_replacements or not doc_files:
+        return
+    replace_words_in_docx(os.path.join(word_folder, doc_files[current_index]), dict(pending_replacements))
+    reset_pending()
+    load_doc_words()
+
+def reset_pending():
+    pending_replacements.clear()
+    batch_var.set("Vorgemerkte ersetzen (0)")
+
 def prev_doc():
     global current_index
+    if not doc_files:
+        return
     current_index = (current_index - 1) % len(doc_files)
+    reset_pending()
     load_doc_words()
+    prefetch_neighbours()
 
 def next_doc():
     global current_index
+    if not doc_files:
+        return
     current_index = (current_index + 1) % len(doc_files)
+    reset_pending()
     load_doc_words()
+    prefetch_neighbours()
+
+# === HINTERGRUND-INDEXIERUNG ===
+def doc_path(filename):
+    return os.path.join(word_folder, filename)
+
+def ordered_from_current():
+    """Dokumente vom aktuellen aus abwechselnd vor und zurück – Nachbarn werden zuerst indexiert."""
+    order = [current_index]
+    for step in range(1, len(doc_files)):
+        order += [(current_index + step) % len(doc_files), (current_index - step) % len(doc_files)]
+    seen = set()
+    return [doc_files[i] for i in order if not (i in seen or seen.add(i))]
+
+def prefetch_neighbours():
+    indexer.submit_all(doc_path(f) for f in ordered_from_current()[1:1 + 2 * PREFETCH_NEIGHBOURS])
+
+def poll_indexer(parent):
+    finished = indexer.collect()
+    if waiting_for and (waiting_for in finished or waiting_for not in indexer.pending):
+        # Bei einem Fehler im Worker wird im Vordergrund indexiert
+        load_doc_words(wait=False)
+    done, total = indexer.progress()
+    status_var.set(f"🗂️ Index: {done}/{total} Dokumente" + (" ✅" if done == total else " ⏳"))
+    parent.after(POLL_MS, poll_indexer, parent)
+
+def scan_folder(parent):
+    global doc_files, current_index
+    added, removed, changed = indexer.scan()
+    if added or removed:
+        current = doc_files[current_index] if doc_files else None
+        doc_files = [f for f in doc_files if f not in removed] + added
+        current_index = doc_files.index(current) if current in doc_files else 0
+        if current not in doc_files:
+            load_doc_words()
+    if doc_files and doc_files[current_index] in changed:
+        # Von außen geändert (z. B. in Word gespeichert): Ansicht aus dem neuen Index aufbauen
+        load_doc_words()
+    parent.after(SCAN_INTERVAL_MS, scan_folder, parent)
+
+def show_corpus_statistics(limit=100):
+    indexes = [get_index(doc_path(f)) for f in doc_files if indexer.is_indexed(doc_path(f))]
+    output_text.delete(1.0, END)
+    output_text.insert(END, f"📊 Wiederholte Wörter über {len(indexes)}/{len(doc_files)} indexierte Dokumente:\n")
+    for word, total, documents in corpus_statistics(indexes, exclude=fuellwoerter)[:limit]:
+        output_text.insert(END, f"{word}: {total}× in {documents} Dokument(en)\n")
 
 # Hauptfunktion, die vom Hauptfenster aufgerufen wird
 def create_word_finder_ui(parent):
-    global word_frame, output_text, fuellwoerter, doc_files, current_index, word_buttons
+    global word_frame, output_text, fuellwoerter, doc_files, current_index, word_buttons, indexer, status_var, \
+        waiting_for, pending_replacements, batch_var, synonyms, synonym_request
 
     fuellwoerter = load_fuellwoerter()
-    doc_files = [f for f in os.listdir(word_folder) if f.endswith(".docx")]
+    doc_files = [f for f in os.listdir(word_folder) if f.endswith(".docx") and not f.startswith("~$")]
     current_index = 0
     word_buttons = []
+    pending_replacements = {}
+
+    waiting_for = None
+    indexer = BackgroundIndexer(word_folder)
+    # Synonyme aus lokalem Dump/Cache oder im Hintergrund aus dem Netz (siehe synonym_service)
+    synonyms = None
+    synonym_request = None
 
     nav_frame = Frame(parent)
     nav_frame.pack(pady=5)
 
     Button(nav_frame, text="<< Vorheriges Dokument", command=prev_doc).pack(side="left", padx=5)
     Button(nav_frame, text="Nächstes Dokument >>", command=next_doc).pack(side="left", padx=5)
+    Button(nav_frame, text="Korpus-Statistik", command=show_corpus_statistics).pack(side="left", padx=5)
+    batch_var = StringVar(value="Vorgemerkte ersetzen (0)")
+    Button(nav_frame, textvariable=batch_var, command=replace_pending).pack(side="left", padx=5)
+    status_var = StringVar(value="")
+    Label(nav_frame, textvariable=status_var).pack(side="left", padx=10)
 
     word_frame = Frame(parent)
     word_frame.pack(fill="both", expand=True, pady=10)
@@ -182,4 +293,20 @@ def create_word_finder_ui(parent):
     scrollbar = Scrollbar(output_text)
     scrollbar.pack(side="right", fill="y")
 
+    output_text.insert(END, "⏳ Lade Dokumente...\n")
+    # Erst nach dem ersten Zeichnen des Reiters Worker starten und das erste Dokument laden
+    parent.after_idle(parent.after, 1, start_indexing, parent)
+    parent.bind("<Destroy>", lambda event: event.widget is parent and shutdown_services())
+
+def shutdown_services():
+    # Fenster geschlossen: Indexierung und Synonym-Abfragen verwerfen statt sie beim Beenden abzuwarten
+    indexer.shutdown()
+    if synonyms is not None:
+        synonyms.close()
+
+def start_indexing(parent):
+    # Alle Dokumente im Hintergrund parsen, das aktuelle und seine Nachbarn zuerst
+    indexer.submit_all(doc_path(f) for f in ordered_from_current())
     load_doc_words()
+    parent.after(POLL_MS, poll_indexer, parent)
+    parent.after(SCAN_INTERVAL_MS, scan_folder, parent)